@@ -4,11 +4,10 @@ import json
 import shutil
 import shelve
 import numpy as np
-from tqdm import tqdm
 from datetime import datetime, timedelta
 from downloader import Downloader
 from datetime import datetime, timedelta
-from llm import generate_llm_response, self_reflect
+from llm import generate_llm_response, generate_llm_responses, self_reflect
 import argparse
 from logger import get_logger
 logger = get_logger(__name__)
@@ -18,23 +17,39 @@ class Analyst:
     def __init__(self, ticker):
         self.ticker = ticker
         self.current_stock_price = Downloader().get_current_ticker_price(self.ticker)
-        
-    def bull_case(self, insights_string):
-        logger.info(f"[Task] Building a bull case for {self.ticker}")
-        prompt = f"""
-        Current price of {self.ticker} is {self.current_stock_price}.
 
-        You are an expert financial analyst at a big hedge fund. You are provided a plethora of information and insights about {self.ticker}.
+    def context(self, insights_string):
+        """
+        Build the system message shared by every analyst prompt of a run. It holds the role, the
+        current price and the insights, and is byte-identical across calls so the provider's prompt
+        cache can reuse it; each task's instructions follow in the user message.
+        Args:
+            insights_string (str): All insights gathered for the ticker.
+        Returns:
+            str: The shared system message.
+        """
+        return f"""You are an expert financial analyst at a big hedge fund. You are provided a plethora of information and insights about {self.ticker}.
+Current price of {self.ticker} is {self.current_stock_price}.
+
+Here is the dump of insights:
+```
+{insights_string}
+```"""
+
+    def bull_case_request(self, insights_string):
+        """
+        Build the LLM request of bull_case, for running it through a BatchExecutor.
+        Args:
+            insights_string (str): All insights gathered for the ticker.
+        Returns:
+            dict: Keyword arguments for generate_llm_response.
+        """
+        prompt = f"""
         You are tasked with writing a bull case for {self.ticker}.
 
         You are not an intern, so make sure the case you write is super technical, super helpful, and super accurate. You have read every finance blog out there,
         so use that knowledge. Think of yourself as the head of quantitative divison in a big prop trading firm.
 
-        Here is the dump of insights:
-        ```
-        {insights_string}
-        ```
-        
         Output Format:
         Your output must be a json with two fields.
         - price_target
@@ -51,25 +66,27 @@ class Analyst:
         Do not start with ```json, start with the first bracket.
         """
 
-        bull_case =  generate_llm_response(prompt, temperature = 0.25)
+        return {"prompt": prompt, "temperature": 0.25, "system": self.context(insights_string)}
+
+    def bull_case(self, insights_string):
+        logger.info(f"[Task] Building a bull case for {self.ticker}")
+        bull_case =  generate_llm_response(**self.bull_case_request(insights_string))
         return json.loads(bull_case)
 
-    def bear_case(self, insights_string):
-        logger.info(f"[Task] Building a bear case for {self.ticker}")
+    def bear_case_request(self, insights_string):
+        """
+        Build the LLM request of bear_case, for running it through a BatchExecutor.
+        Args:
+            insights_string (str): All insights gathered for the ticker.
+        Returns:
+            dict: Keyword arguments for generate_llm_response.
+        """
         prompt = f"""
-        Current price of {self.ticker} is {self.current_stock_price}.
-        
-        You are an expert financial analyst at a big hedge fund. You are provided a plethora of information and insights about {self.ticker}.
         You are tasked with writing a bear case for {self.ticker}.
 
         You are not an intern, so make sure the case you write is super technical, super helpful, and super accurate. You have read every finance blog out there,
         so use that knowledge. Think of yourself as the head of quantitative divison in a big prop trading firm.
 
-        Here is the dump of insights:
-        ```
-        {insights_string}
-        ```
-
         Output Format:
         Your output must be a json with two fields.
         - price_target
@@ -88,25 +105,29 @@ class Analyst:
         Do not start with ```json, start with the first bracket.
         """
 
-        bear_case = generate_llm_response(prompt, temperature = 0.25)
+        return {"prompt": prompt, "temperature": 0.25, "system": self.context(insights_string)}
+
+    def bear_case(self, insights_string):
+        logger.info(f"[Task] Building a bear case for {self.ticker}")
+        bear_case = generate_llm_response(**self.bear_case_request(insights_string))
         return json.loads(bear_case)
 
-    def base_case(self, insights_string, bull_case, bear_case):
-        logger.info(f"[Task] Building a base case for {self.ticker}")
+    def base_case_request(self, insights_string, bull_case, bear_case):
+        """
+        Build the LLM request of base_case, for running it through a BatchExecutor.
+        Args:
+            insights_string (str): All insights gathered for the ticker.
+            bull_case (dict): The bull case.
+            bear_case (dict): The bear case.
+        Returns:
+            dict: Keyword arguments for generate_llm_response.
+        """
         prompt = f"""
-        Current price of {self.ticker} is {self.current_stock_price}.
-        
-        You are an expert financial analyst at a big hedge fund. You are provided a plethora of information and insights about {self.ticker}.
         You are tasked with writing a base case for {self.ticker}.
 
         You are not an intern, so make sure the case you write is super technical, super helpful, and super accurate. You have read every finance blog out there,
         so use that knowledge. Think of yourself as the head of quantitative divison in a big prop trading firm.
 
-        Here is the dump of insights:
-        ```
-        {insights_string}
-        ```
-
         Your price target must be between the bull and bear case, which are given below. Your thesis could however be completely different.
         {bull_case}
         {bear_case}
@@ -129,9 +150,16 @@ class Analyst:
         Do not start with ```json, start with the first bracket.
         """
 
-        base_case =  generate_llm_response(prompt, temperature = 0.25)
+        return {"prompt": prompt, "temperature": 0.25, "system": self.context(insights_string)}
 
-        # get a shorter base case
+    def shorter_base_case_request(self, base_case):
+        """
+        Build the LLM request of the shorter base case, for running it through a BatchExecutor.
+        Args:
+            base_case (str): The response to the base case request.
+        Returns:
+            dict: Keyword arguments for generate_llm_response.
+        """
         prompt = f"""
             You are an expert financial analyst at a big hedge fund. You are provided a plethora of information and insights about {self.ticker}.
             You are tasked with writing a base case for {self.ticker}. You already have a base case written, you just need to now shorten it in 1 sentence (20 words max), and use first person (I).
@@ -147,10 +175,24 @@ class Analyst:
             Here is the longer base  case:
             {base_case}
         """
-        shorter_base_case = generate_llm_response(prompt, temperature = 0.25)
+        return {"prompt": prompt, "temperature": 0.25}
+
+    def base_case(self, insights_string, bull_case, bear_case):
+        logger.info(f"[Task] Building a base case for {self.ticker}")
+        base_case =  generate_llm_response(**self.base_case_request(insights_string, bull_case, bear_case))
+
+        # get a shorter base case
+        shorter_base_case = generate_llm_response(**self.shorter_base_case_request(base_case))
         return json.loads(base_case), shorter_base_case
 
-    def risk_reward_themes(self, insights_string):
+    def risk_reward_themes_request(self, insights_string):
+        """
+        Build the LLM request of risk_reward_themes, for running it through a BatchExecutor.
+        Args:
+            insights_string (str): All insights gathered for the ticker.
+        Returns:
+            dict: Keyword arguments for generate_llm_response.
+        """
         risk_reward_summary = """
         Contrarian
         Positive: Stock call and key underlying numbers are materially above / more bullish than Consensus.
@@ -194,8 +236,7 @@ class Analyst:
         """
         
         prompt = f"""
-        You are an expert financial analyst at a big hedge fund. You are provided a plethora of information and insights about {self.ticker}.
-        Your job is to pick three risk reward themes in the list provided below, then carefully go through all the data provided next about {self.ticker}, and extract
+        Your job is to pick three risk reward themes in the list provided below, then carefully go through all the insights provided about {self.ticker}, and extract
         the top 3 risk reward themes with their values (positive, negative).
 
         Risk Reward Themes:
@@ -203,11 +244,6 @@ class Analyst:
         {risk_reward_summary}
         ```
 
-        Insights:
-        ```
-        {insights_string}
-        ```
-
         Output Format:
         Your output must be a list with three dictionaries, each dictionary will have the theme name and value would be positive or negative. Thats all we need.
         
@@ -217,25 +253,26 @@ class Analyst:
         Do not start with ```json, start with the first bracket.
         """
 
-        risk_reward_themes = generate_llm_response(prompt, temperature = 0.25)
+        return {"prompt": prompt, "temperature": 0.25, "system": self.context(insights_string)}
+
+    def risk_reward_themes(self, insights_string):
+        risk_reward_themes = generate_llm_response(**self.risk_reward_themes_request(insights_string))
         return json.loads(risk_reward_themes)
 
-    def thesis(self, insights_string):
-        logger.info(f"[Task] Building a thesis for {self.ticker}")
+    def thesis_request(self, insights_string):
+        """
+        Build the LLM request of thesis, for running it through a BatchExecutor.
+        Args:
+            insights_string (str): All insights gathered for the ticker.
+        Returns:
+            dict: Keyword arguments for generate_llm_response.
+        """
         prompt = f"""
-        Current price of {self.ticker} is {self.current_stock_price}.
-        
-        You are an expert financial analyst at a big hedge fund. You are provided a plethora of information and insights about {self.ticker}.
         You are tasked with writing an analyst rating for {self.ticker}, i.e Underweight, Overweight or Equal-weight.
 
         You are not an intern, so make sure the case you write is super technical, super helpful, and super accurate. You have read every finance blog out there,
         so use that knowledge. Think of yourself as the head of quantitative divison in a big prop trading firm.
 
-        Here is the dump of insights:
-        ```
-        {insights_string}
-        ```
-
         Output Format:
         Your output must be a json with two fields.
         - analyst_rating
@@ -255,16 +292,22 @@ class Analyst:
 
         Do not start with ```json, start with the first bracket.
         """
-        thesis = generate_llm_response(prompt, temperature = 0.25)
+        return {"prompt": prompt, "temperature": 0.25, "system": self.context(insights_string)}
+
+    def thesis(self, insights_string):
+        logger.info(f"[Task] Building a thesis for {self.ticker}")
+        thesis = generate_llm_response(**self.thesis_request(insights_string))
         return json.loads(thesis)
 
-    def price_target(self, insights_string):
-        targets = []
-        logger.info(f"[Task] Building price targets for {self.ticker}")
+    def price_target_request(self, insights_string):
+        """
+        Build the LLM request of price_target, for running it through a BatchExecutor.
+        Args:
+            insights_string (str): All insights gathered for the ticker.
+        Returns:
+            dict: Keyword arguments for generate_llm_responses.
+        """
         prompt = f"""
-        Current price of {self.ticker} is {self.current_stock_price}.
-        
-        You are an expert financial analyst at a big hedge fund. You are provided a plethora of information and insights about {self.ticker}.
         You are tasked with writing a price target for {self.ticker}.
 
         Your output must be of the following format.
@@ -279,25 +322,38 @@ class Analyst:
         </price>
 
         Think of the future growth, risks, strengths, all of the stuff that a senior analyst would think about. Dont be shallow, think deep. Be creative, what is something that people might miss?
-
-        Here is the information provided to you:
-        ```
-        {insights_string}
-        ```
         """
 
-        for _ in tqdm(range(10), desc="Generating price targets"):
-            target = generate_llm_response(prompt, temperature = 1, model="gpt-4o")
+        # one request for all 10 samples, the long insights prompt is only sent once
+        return {"prompt": prompt, "n": 10, "temperature": 1, "model": "gpt-4o", "system": self.context(insights_string)}
+
+    def parse_price_targets(self, responses):
+        """
+        Read the price targets out of the price_target responses.
+        Args:
+            responses (list): The responses to the price_target request.
+        Returns:
+            list: The price targets as floats.
+        """
+        targets = []
+        for target in responses:
             target = target.split("<price>")[-1].split("</price>")[0]
             targets.append(float(target))
         return targets
 
-    def heading(self, insights_string):
-        logger.info(f"[Task] Building a heading for {self.ticker}")
-        prompt = f"""
-        Current price of {self.ticker} is {self.current_stock_price}.
+    def price_target(self, insights_string):
+        logger.info(f"[Task] Building price targets for {self.ticker}")
+        return self.parse_price_targets(generate_llm_responses(**self.price_target_request(insights_string)))
 
-        You are an expert financial analyst at a big hedge fund. You are provided a plethora of information and insights about {self.ticker}.
+    def heading_request(self, insights_string):
+        """
+        Build the LLM request of heading, for running it through a BatchExecutor.
+        Args:
+            insights_string (str): All insights gathered for the ticker.
+        Returns:
+            dict: Keyword arguments for generate_llm_response.
+        """
+        prompt = """
         You are tasked with writing a heading for the report. At max 6-10 words.
 
         An example of a great heading is 
@@ -305,21 +361,24 @@ class Analyst:
 
         - Heading should be related to what the company does.
 
-        Here is the data you have
-        ```
-        {insights_string}
-        ```
-
         Return a heading only, no prefix, suffix, no starting with `here is.`, just the heading. Dont use words amid, delve, keep it basic english.
         """
-        heading = generate_llm_response(prompt, temperature = 0.5, model="gpt-4o-mini")
+        return {"prompt": prompt, "temperature": 0.5, "model": "gpt-4o-mini", "system": self.context(insights_string)}
+
+    def heading(self, insights_string):
+        logger.info(f"[Task] Building a heading for {self.ticker}")
+        heading = generate_llm_response(**self.heading_request(insights_string))
         return heading
     
-    def radar(self, insights_string):
-        logger.info(f"[Task] Building health metrics & ratings for {self.ticker}")
+    def radar_request(self, insights_string):
+        """
+        Build the LLM request of radar, for running it through a BatchExecutor.
+        Args:
+            insights_string (str): All insights gathered for the ticker.
+        Returns:
+            dict: Keyword arguments for generate_llm_responses.
+        """
         prompt = f"""
-        Current price of {self.ticker} is {self.current_stock_price}.
-        You are an expert financial analyst at a big hedge fund. You are provided a plethora of information and insights about {self.ticker}.
         You are tasked with finding a radar chart data for {self.ticker}.
 
         We are going to build a radar chart for a company where we score the company on 5 different axis, and we score out of 5. 
@@ -344,16 +403,20 @@ class Analyst:
         </data>
 
         Make sure there is a valid json inside the data tag.
-        Here is the insights dump.
-        ```
-        {insights_string}
-        ```
         """
+        return {"prompt": prompt, "n": 5, "temperature": 0.5, "model": "gpt-4o", "system": self.context(insights_string)}
 
+    def parse_radar(self, responses):
+        """
+        Average the ratings of the radar responses.
+        Args:
+            responses (list): The responses to the radar request.
+        Returns:
+            dict: Mapping of category to its rounded average rating.
+        """
         results = []
         
-        for _ in tqdm(range(5), desc="Generating AI ratings"):
-            radar = generate_llm_response(prompt, temperature=0.5, model="gpt-4o")
+        for radar in responses:
             radar_data = radar.split("<data>")[-1].split("</data>")[0]
             results.append(json.loads(radar_data))
         
@@ -365,3 +428,7 @@ class Analyst:
         averaged_radar = {key: int(round(value)) for key, value in averaged_radar.items()}
 
         return averaged_radar
+
+    def radar(self, insights_string):
+        logger.info(f"[Task] Building health metrics & ratings for {self.ticker}")
+        return self.parse_radar(generate_llm_responses(**self.radar_request(insights_string)))
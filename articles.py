@@ -0,0 +1,92 @@
+import os
+import time
+import threading
+from datetime import datetime, timedelta
+from caching import SQLiteStore
+from config import NEWS_SYNC_MINUTES, NEWS_RETENTION_DAYS
+from logger import get_logger
+logger = get_logger(__name__)
+
+def article_key(article):
+    """
+    Identify a news article by its url, falling back to its publish date and title.
+    Args:
+        article (dict): A news article from the stock_news endpoint.
+    Returns:
+        str: The article key.
+    """
+    return article.get('url') or f"{article.get('publishedDate')}|{article.get('title')}"
+
+class ArticleStore:
+    def __init__(self, path = os.path.join('cache', 'news.sqlite3'), sync_interval = NEWS_SYNC_MINUTES * 60, retention_days = NEWS_RETENTION_DAYS):
+        """
+        Persistent per-ticker set of news articles, so a refresh only has to fetch the articles
+        published since the newest stored one. Articles older than the retention window are aged out.
+        Args:
+            path (str): Path of the SQLite database file.
+            sync_interval (float): Seconds a synced ticker is trusted before new articles are fetched.
+            retention_days (int): Articles published more than this many days ago are dropped.
+        """
+        self.store = SQLiteStore(path)
+        self.sync_interval = sync_interval
+        self.retention = timedelta(days=retention_days)
+
+    def load(self, ticker):
+        """
+        Get the stored articles of a ticker.
+        Args:
+            ticker (str): The stock ticker symbol.
+        Returns:
+            tuple: (articles latest first, whether they were synced within the sync interval).
+        """
+        entry = self.store.get(ticker)
+        if entry is None:
+            return [], False
+        return entry['articles'], time.time() - entry['synced'] < self.sync_interval
+
+    def expired(self, article):
+        """
+        Check whether an article is older than the retention window, i.e. would be aged out on save.
+        Args:
+            article (dict): A news article from the stock_news endpoint.
+        Returns:
+            bool: True if the article was published before the retention window.
+        """
+        try:
+            return datetime.strptime(str(article.get('publishedDate'))[:19], '%Y-%m-%d %H:%M:%S') < datetime.now() - self.retention
+        except ValueError:
+            return False
+
+    def save(self, ticker, new_articles, stored_articles):
+        """
+        Merge newly fetched articles into the stored ones, age out old articles and persist the result.
+        Args:
+            ticker (str): The stock ticker symbol.
+            new_articles (list): Articles fetched in this sync.
+            stored_articles (list): Articles that were already stored.
+        Returns:
+            list: The merged articles, latest first.
+        """
+        merged = {}
+        for article in list(new_articles) + list(stored_articles):
+            key = article_key(article)
+            if key not in merged and not self.expired(article):
+                merged[key] = article
+        articles = sorted(merged.values(), key=lambda article: str(article.get('publishedDate')), reverse=True)
+        self.store.set(ticker, {'articles': articles, 'synced': time.time()})
+        return articles
+
+_article_store = None
+_article_store_lock = threading.Lock()
+
+def get_article_store():
+    """
+    Get the process-wide article store, creating it on first use.
+    Returns:
+        ArticleStore: The shared article store.
+    """
+    global _article_store
+    with _article_store_lock:
+        if _article_store is None:
+            _article_store = ArticleStore()
+        return _article_store
@@ -0,0 +1,80 @@
+import os
+import glob
+import time
+import argparse
+from parser import Parser
+from logger import get_logger
+logger = get_logger(__name__)
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Benchmark the SEC filing parser engines over stored filings')
+    parser.add_argument('files', nargs='*', help='Filing HTML files, defaults to every filing in cache/filings')
+    parser.add_argument('--repeat', type=int, default=3, help='Parses per engine and file, the fastest one is reported')
+    parser.add_argument('--dedup_report', action='store_true', help='Also report per section bytes and tokens saved over the original nested-element extraction')
+    return parser.parse_args()
+
+def _fastest(parse, html_content, repeat):
+    best = None
+    sections = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        sections = parse(html_content)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, sections
+
+def time_parse(engine, html_content, repeat):
+    """
+    Parse a filing several times with an engine.
+    Args:
+        engine (str): The parser engine, 'lxml' or 'bs4'.
+        html_content (str): The HTML content of the filing.
+        repeat (int): Number of parses.
+    Returns:
+        tuple: (fastest parse time in seconds, parsed sections).
+    """
+    return _fastest(lambda content: Parser(engine).parse_sec_filing(content), html_content, repeat)
+
+def time_original(html_content, repeat):
+    """
+    Parse a filing several times with the original find_all/get_text extraction, the baseline
+    both engines are compared against. Its output repeats nested text, so it is not compared.
+    Args:
+        html_content (str): The HTML content of the filing.
+        repeat (int): Number of parses.
+    Returns:
+        tuple: (fastest parse time in seconds, parsed sections).
+    """
+    def parse(content):
+        parser = Parser('bs4')
+        return parser._clean_sections(parser._collect_sections_nested(content))
+    return _fastest(parse, html_content, repeat)
+
+def main():
+    args = parse_arguments()
+    files = args.files or sorted(glob.glob(os.path.join('cache', 'filings', '*', '*', '*.html')))
+    if not files:
+        logger.error('No stored filings found, run velocity.py for a ticker first or pass filing paths')
+        return
+
+    total_original, total_bs4, total_lxml = 0, 0, 0
+    for path in files:
+        with open(path, 'r', encoding='utf-8') as f:
+            html_content = f.read()
+        original_time, _ = time_original(html_content, args.repeat)
+        bs4_time, bs4_sections = time_parse('bs4', html_content, args.repeat)
+        lxml_time, lxml_sections = time_parse('lxml', html_content, args.repeat)
+        total_original += original_time
+        total_bs4 += bs4_time
+        total_lxml += lxml_time
+        same = "same output" if bs4_sections == lxml_sections else "OUTPUT DIFFERS"
+        logger.info(f"{path}: {len(html_content) / 1e6:.1f}MB, original {original_time:.2f}s, bs4 {bs4_time:.2f}s ({original_time / bs4_time:.1f}x), "
+                    f"lxml {lxml_time:.2f}s ({original_time / lxml_time:.1f}x), {same}")
+        if args.dedup_report:
+            for section, sizes in Parser().dedup_report(html_content).items():
+                logger.info(f"    {section}: {sizes['bytes_before']} -> {sizes['bytes_after']} bytes, {sizes['tokens_before']} -> {sizes['tokens_after']} tokens")
+    logger.info(f"Total over {len(files)} filings: original {total_original:.2f}s, bs4 {total_bs4:.2f}s ({total_original / total_bs4:.1f}x), "
+                f"lxml {total_lxml:.2f}s ({total_original / total_lxml:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+import os
+import dbm
+import time
+import zlib
+import pickle
+import shelve
+import sqlite3
+import functools
+import threading
+from collections import OrderedDict, defaultdict
+from config import CACHE_TTLS, CACHE_MEMORY_ITEMS, CACHE_MAX_AGE_DAYS, CACHE_COMPRESSION, CACHE_COMPRESS_MIN_BYTES
+from logger import get_logger
+logger = get_logger(__name__)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MISSING = object()
+
+class SQLiteStore:
+    def __init__(self, path, compression = CACHE_COMPRESSION, compress_min_bytes = CACHE_COMPRESS_MIN_BYTES):
+        """
+        Persistent key value store backed by SQLite in WAL mode, which allows many concurrent
+        readers across threads and processes alongside atomic, transactional writes.
+        Values are pickled and large ones are compressed with zstd (or zlib if zstandard is not installed).
+        Args:
+            path (str): Path of the SQLite database file.
+            compression (str): 'zstd', 'zlib' or None to store values uncompressed.
+            compress_min_bytes (int): Values smaller than this are stored uncompressed.
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        if compression == 'zstd' and zstandard is None:
+            compression = 'zlib'
+        self.compression = compression
+        self.compress_min_bytes = compress_min_bytes
+        self.local = threading.local()
+        with self._connection() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, codec TEXT NOT NULL, size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)")
+
+    def _connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    def _encode(self, value):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if self.compression is None or len(data) < self.compress_min_bytes:
+            return data, 'raw'
+        if self.compression == 'zstd':
+            return zstandard.ZstdCompressor().compress(data), 'zstd'
+        return zlib.compress(data), 'zlib'
+
+    def _decode(self, data, codec):
+        if codec == 'zstd':
+            data = zstandard.ZstdDecompressor().decompress(data)
+        elif codec == 'zlib':
+            data = zlib.decompress(data)
+        return pickle.loads(data)
+
+    def get(self, key):
+        row = self._connection().execute("SELECT value, codec FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return self._decode(row[0], row[1])
+
+    def set(self, key, value):
+        data, codec = self._encode(value)
+        now = time.time()
+        with self._connection() as connection:
+            connection.execute("INSERT OR REPLACE INTO entries (key, value, codec, size, created, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                               (key, data, codec, len(data), now, now))
+
+    def delete(self, key):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def __contains__(self, key):
+        return self._connection().execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone() is not None
+
+    def touch(self, key):
+        # mark an entry as used, prune evicts the least recently used entries first
+        with self._connection() as connection:
+            connection.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+
+    def prune(self, max_age = None, max_bytes = None):
+        """
+        Evict entries not used within max_age, then the least recently used ones until the stored
+        values fit in max_bytes.
+        Args:
+            max_age (float): Seconds since an entry was last used after which it is evicted, None to keep.
+            max_bytes (int): Upper bound of the total size of the stored values, None for no bound.
+        Returns:
+            int: Number of evicted entries.
+        """
+        evicted = 0
+        with self._connection() as connection:
+            if max_age is not None:
+                evicted += connection.execute("DELETE FROM entries WHERE accessed < ?", (time.time() - max_age,)).rowcount
+            if max_bytes is not None:
+                total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+                if total > max_bytes:
+                    keys = []
+                    for key, size in connection.execute("SELECT key, size FROM entries ORDER BY accessed"):
+                        if total <= max_bytes:
+                            break
+                        keys.append((key,))
+                        total -= size
+                    connection.executemany("DELETE FROM entries WHERE key = ?", keys)
+                    evicted += len(keys)
+        return evicted
+
+def migrate_shelve(shelve_path, store, keep = None):
+    """
+    Copy the entries of a legacy shelve file into a store, once. A marker entry in the store
+    records that the migration happened so later runs skip it.
+    Args:
+        shelve_path (str): Path of the shelve file, without the dbm specific suffix.
+        store (SQLiteStore): Store to copy the entries into.
+        keep (callable): Optional predicate taking (key, value); entries for which it is False are skipped.
+    """
+    marker = f"__migrated__:{os.path.abspath(shelve_path)}"
+    if marker in store or not dbm.whichdb(shelve_path):
+        return
+    migrated = 0
+    try:
+        with shelve.open(shelve_path, 'r') as db:
+            for key in db.keys():
+                value = db[key]
+                if keep is None or keep(key, value):
+                    store.set(key, value)
+                    migrated += 1
+    except Exception as e:
+        logger.warning(f"[Warning] Could not migrate {shelve_path}: {e}")
+        return
+    store.set(marker, time.time())
+    logger.info(f"[Cache] Migrated {migrated} entries from {shelve_path} to {store.path}")
+
+class TieredCache:
+    def __init__(self, store, max_items = CACHE_MEMORY_ITEMS):
+        """
+        Two tier cache: an in-process LRU in front of a persistent store. Entries carry their own
+        expiry so every endpoint can have its own TTL.
+        Args:
+            store: Persistent store with get(key) and set(key, value).
+            max_items (int): Maximum number of entries kept in the in-process tier.
+        """
+        self.store = store
+        self.max_items = max_items
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = defaultdict(lambda: {"memory_hits": 0, "disk_hits": 0, "misses": 0})
+
+    def _remember(self, key, entry):
+        with self.lock:
+            self.memory[key] = entry
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_items:
+                self.memory.popitem(last=False)
+
+    def _fresh(self, entry):
+        return entry is not None and (entry['expires'] is None or entry['expires'] > time.time())
+
+    def get(self, endpoint, key):
+        """
+        Look up a cached value.
+        Args:
+            endpoint (str): Name of the endpoint the value belongs to, used for the counters.
+            key (str): Cache key.
+        Returns:
+            Any: The cached value, or MISSING if there is no fresh entry.
+        """
+        with self.lock:
+            entry = self.memory.get(key)
+            if self._fresh(entry):
+                self.memory.move_to_end(key)
+                self.counters[endpoint]["memory_hits"] += 1
+                return entry['value']
+
+        entry = self.store.get(key)
+        if self._fresh(entry):
+            self._remember(key, entry)
+            with self.lock:
+                self.counters[endpoint]["disk_hits"] += 1
+            return entry['value']
+
+        with self.lock:
+            self.counters[endpoint]["misses"] += 1
+        return MISSING
+
+    def set(self, endpoint, key, value, ttl = MISSING):
+        """
+        Store a value in both tiers.
+        Args:
+            endpoint (str): Name of the endpoint, used to look up the default TTL in CACHE_TTLS.
+            key (str): Cache key.
+            value (Any): Value to cache.
+            ttl (float): Seconds the value stays fresh, None to cache forever. Defaults to CACHE_TTLS[endpoint].
+        """
+        if ttl is MISSING:
+            ttl = CACHE_TTLS[endpoint]
+        entry = {'value': value, 'expires': None if ttl is None else time.time() + ttl}
+        self._remember(key, entry)
+        self.store.set(key, entry)
+
+    def stats(self):
+        """
+        Get hit and miss counters per endpoint.
+        Returns:
+            dict: Mapping of endpoint to its memory_hits, disk_hits and misses.
+        """
+        with self.lock:
+            return {endpoint: dict(counter) for endpoint, counter in self.counters.items()}
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """
+    Get the process-wide Downloader cache, creating and pruning it on first use.
+    Returns:
+        TieredCache: The shared cache.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            store = SQLiteStore(os.path.join('cache', 'cache.sqlite3'))
+            # only entries written by this cache, raw filings and news now have their own stores
+            migrate_shelve(os.path.join('cache', 'cache.db'), store, keep=lambda key, value: isinstance(value, dict) and 'expires' in value)
+            # expired entries are only skipped on read, so the ones nobody asks for again have to be evicted
+            evicted = store.prune(max_age=CACHE_MAX_AGE_DAYS * 24 * 60 * 60)
+            if evicted:
+                logger.info(f"[Cache] Evicted {evicted} Downloader cache entries")
+            _cache = TieredCache(store)
+        return _cache
+
+def cached(endpoint):
+    """
+    Cache the results of a Downloader method with the TTL configured for the endpoint in CACHE_TTLS.
+    The cache key is built from the endpoint name and the call arguments. None results are not cached.
+    Args:
+        endpoint (str): Name of the endpoint.
+    Returns:
+        callable: The decorator.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            key = f"{endpoint}:{args!r}:{sorted(kwargs.items())!r}"
+            cache = get_cache()
+            value = cache.get(endpoint, key)
+            if value is MISSING:
+                value = method(self, *args, **kwargs)
+                if value is not None:
+                    cache.set(endpoint, key, value)
+            return value
+        return wrapper
+    return decorator
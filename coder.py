@@ -7,7 +7,7 @@ import random
 from tqdm import tqdm
 from datetime import datetime, timedelta
 from downloader import Downloader
-from llm import generate_llm_response, self_reflect
+from llm import generate_llm_response, self_reflect, get_llm_executor
 from config import CODING_AGENT_TYPES, FUNCTION_MAPPINGS, FINANCIAL_STATISTICAL_INSIGHTS
 from sandbox import run_code
 from agent import Agent
@@ -19,14 +19,14 @@ class CodingAgent(Agent):
         self.ticker = ticker
         self.downloader = Downloader(self.ticker)
     
-    def insights(self, plan, result):
+    def insights_request(self, plan, result):
         """
-        Generate insights based on the given plan and result.
+        Build the LLM request of insights, for running it through a BatchExecutor.
         Args:
             plan (str): The original plan or task given to the analyst.
             result (str): The results or output from the analyst's work.
         Returns:
-            str: A paragraph of insights with a heading/title in the first line.
+            dict: Keyword arguments for generate_llm_response.
         """
 
         prompt = f"""
@@ -47,15 +47,26 @@ class CodingAgent(Agent):
         No prefix, suffix, starting with `here is`, etc. Start directly with insights. Use numbers and statistics where you can.
         """
 
-        response = generate_llm_response(prompt, model = "gpt-4o", temperature = 0.2)
+        return {"prompt": prompt, "model": "gpt-4o", "temperature": 0.2}
+
+    def insights(self, plan, result):
+        """
+        Generate insights based on the given plan and result.
+        Args:
+            plan (str): The original plan or task given to the analyst.
+            result (str): The results or output from the analyst's work.
+        Returns:
+            str: A paragraph of insights with a heading/title in the first line.
+        """
+        response = generate_llm_response(**self.insights_request(plan, result))
         return response
     
 
-    def code(self):
+    def code_request(self):
         """
-        Generate a Python code snippet for financial analysis.
+        Build the LLM request of code, for running it through a BatchExecutor.
         Returns:
-            str: A Python code snippet for analyzing financial data.
+            dict: Keyword arguments for generate_llm_response.
         """
 
         agent_type = random.choice(CODING_AGENT_TYPES)
@@ -85,11 +96,29 @@ class CodingAgent(Agent):
             DO NOT ASSUME ANYTHING, YOU ARE AN EXPERT. MAKE SURE YOU KNOW WHAT YOU ARE DOING. ADD CHECKS FOR THINGS LIKE DIVISION, TYPES, KEY CHECKS, NULL CHECKS ETC.
         """
 
-        response = generate_llm_response(plan_prompt, model = "gpt-4o", temperature = 0.2)
+        return {"prompt": plan_prompt, "model": "gpt-4o", "temperature": 0.2}
+
+    def parse_code(self, response):
+        """
+        Strip the markdown fences the model sometimes puts around the code.
+        Args:
+            response (str): The response to the code request.
+        Returns:
+            str: The Python code snippet.
+        """
         response = response.replace("```python", "")
         response = response.replace("```", "")
         return response
 
+    def code(self):
+        """
+        Generate a Python code snippet for financial analysis.
+        Returns:
+            str: A Python code snippet for analyzing financial data.
+        """
+        response = generate_llm_response(**self.code_request())
+        return self.parse_code(response)
+
 
     def run(self):
         """
@@ -99,17 +128,20 @@ class CodingAgent(Agent):
         Returns:
             list: A list of insights generated from the statistical analysis.
         """
-        insights = []
         logger.info(f"[Task] Running CODING Agent to extract statistical insights for {self.ticker}")
         logger.info(f"[Coding...]")
-        for _ in tqdm(range(FINANCIAL_STATISTICAL_INSIGHTS), desc="Coding & extracting statistical insights", unit="insight"):
-            code_plan = self.code()
+        executor = get_llm_executor()
+        # all snippets are written at once, each insight is requested while the next snippet runs
+        code_plans = [executor.submit(self.code) for _ in range(FINANCIAL_STATISTICAL_INSIGHTS)]
+        insight_futures = []
+        for code_plan in tqdm(code_plans, desc="Coding & extracting statistical insights", unit="insight"):
+            code_plan = code_plan.result()
             analysis = run_code(code_plan)
             if analysis is None or analysis == "":
                 continue
 
-            insight = self.insights(plan = code_plan, result = analysis)
-            insights.append(insight)
+            insight_futures.append(executor.submit(self.insights, plan = code_plan, result = analysis))
+        insights = [future.result() for future in insight_futures]
 
         logger.info(f"[Task] Success, Extracted {len(insights)} statistical insights for {self.ticker}")
         return insights
@@ -3,6 +3,87 @@ SEC_INSIGHTS = 10 # how many insights to extract from SEC data
 FINANCIAL_STATISTICAL_INSIGHTS = 10 # how many statistical insights to extract from data
 NEWS_INSIGHTS = 10 # how many insights to extract from news data
 EARNINGS_TRANSCRIPT_INSIGHTS = 10 # how many insights to extract from earnings transcript data
+FMP_REQUESTS_PER_MINUTE = 300 # request quota of our financialmodelingprep.com plan
+HTTP_POOL_SIZE = 32 # keep-alive connections kept open per host
+HTTP_MAX_CONNECTIONS_PER_HOST = 8 # max requests in flight to a single host
+HTTP_MAX_RETRIES = 5 # retries on 429/5xx responses and connection errors
+HTTP_BACKOFF_BASE = 0.5 # seconds, base of the jittered exponential backoff
+HTTP_BACKOFF_CAP = 30 # seconds, upper bound of a single backoff
+HTTP_TIMEOUT = 30 # seconds before a single http request is abandoned
+ASYNC_DOWNLOADER_WORKERS = 16 # max AsyncDownloader calls running at once, http concurrency is still capped per host
+HTTP_PAGE_WINDOW = 5 # max pages of a paginated endpoint requested concurrently
+HOST_RATE_LIMITS = { # requests per second allowed for each host
+    "financialmodelingprep.com": FMP_REQUESTS_PER_MINUTE / 60,
+    "www.sec.gov": 10,
+    "data.sec.gov": 10,
+}
+SEC_COMPANY_NAME = "Blotter" # identifies us to EDGAR in the User-Agent header
+SEC_EMAIL = "info@blotter.fyi"
+SEC_FILING_CHECK_MINUTES = 300 # how long a known latest filing is trusted before EDGAR is asked for a newer one
+SEC_PARSER_ENGINE = "lxml" # "lxml" (C-backed, falls back to "bs4" if unavailable) or "bs4" (BeautifulSoup html.parser)
+SEC_PARSE_WORKERS = 0 # processes that parse SEC filings in parallel, 0 parses in the calling thread
+NEWS_PAGE_SIZE = 50 # articles per stock_news page
+NEWS_MAX_PAGES = 25 # max stock_news pages fetched per ticker
+NEWS_SYNC_MINUTES = 300 # stored news for a ticker is checked for new articles when older than this
+NEWS_RETENTION_DAYS = 180 # stored news articles older than this are aged out
+NEWS_DIGEST_MAX_ARTICLES = 300 # latest articles summarized into the news digest the news agent extracts from
+NEWS_DIGEST_CHUNK_ARTICLES = 10 # articles summarized per map request of the news digest
+NEWS_DIGEST_ARTICLE_TOKENS = 1500 # an article is cut down to this many tokens before it is summarized
+NEWS_DIGEST_REDUCE_TOKENS = 12000 # article summaries condensed per reduce request, more are condensed in groups first
+CACHE_COMPRESSION = "zstd" # compression of large cached values, "zstd" (falls back to "zlib" without zstandard), "zlib" or None
+CACHE_COMPRESS_MIN_BYTES = 16 * 1024 # cached values smaller than this are stored uncompressed
+PRICE_SYNC_MINUTES = 60 # a ticker's stored price history is checked for new days when older than this
+MACRO_REFRESH_HOURS = 24 # the shared macro snapshot is refreshed when older than this
+LLM_MAX_CONCURRENT_REQUESTS = 8 # LLM requests the shared LLM executor runs at once
+LLM_RATE_LIMITS = { # requests and tokens per minute of our OpenAI tier, per model; models not listed are not throttled
+    "gpt-4o": {"rpm": 500, "tpm": 30000},
+    "gpt-4o-mini": {"rpm": 500, "tpm": 200000},
+}
+LLM_OUTPUT_TOKENS_ESTIMATE = 1024 # completion tokens assumed per response when budgeting a request against the TPM limit
+LLM_CONTEXT_BUDGETS = { # tokens of source material (news, transcript, filing section) packed into one prompt, per model
+    "gpt-4o": 24000,
+    "gpt-4o-mini": 24000,
+}
+LLM_DEFAULT_CONTEXT_BUDGET = 8000 # tokens of source material per prompt, for models not in LLM_CONTEXT_BUDGETS
+CONTEXT_CHUNK_TOKENS = 400 # long documents are split into chunks of about this many tokens before packing
+CONTEXT_DUPLICATE_SIMILARITY = 0.5 # items whose opening overlaps a packed item this much (shingle jaccard) are dropped as near duplicates
+NEWS_MAX_ARTICLES_PER_SITE = 30 # at most this many articles of one site are packed into a news prompt
+LLM_PRICES = { # USD per million tokens, used to estimate the cost of each LLM call
+    "gpt-4o": {"input": 2.5, "cached_input": 1.25, "output": 10.0},
+    "gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "output": 0.6},
+}
+LLM_BATCH_DISCOUNT = 0.5 # batch API requests cost this fraction of the regular price
+LLM_BATCH_POLL_SECONDS = 60 # how often a submitted LLM batch is checked for completion
+LLM_BATCH_COMPLETION_WINDOW = "24h" # how long the provider may take for a batch, unfinished requests are then sent as regular requests
+LLM_BATCH_MAX_REQUESTS = 50000 # requests per batch allowed by the provider, larger queues are split into several batches
+LLM_BATCH_MAX_BYTES = 190 * 1024 * 1024 # size of a batch input file, the provider allows 200 MB
+LLM_TIMEOUTS = { # seconds before a single request to a model is abandoned and retried
+    "gpt-4o": 120,
+    "gpt-4o-mini": 60,
+}
+LLM_DEFAULT_TIMEOUT = 90 # seconds, for models not in LLM_TIMEOUTS
+LLM_MAX_RETRIES = 4 # retries on rate limits, timeouts, connection and server errors
+LLM_BACKOFF_BASE = 1 # seconds, base of the jittered exponential backoff between LLM retries
+LLM_BACKOFF_CAP = 60 # seconds, upper bound of a single LLM backoff
+LLM_POOL_SIZE = 16 # keep-alive connections of the shared OpenAI client
+LLM_CACHE_POLICY = None # "deterministic" caches temperature 0 LLM calls, "seeded" also any call with a seed, None disables the LLM response cache
+LLM_SEED = None # seed passed to every LLM call that does not pin its own, makes sampling (mostly) reproducible
+LLM_CACHE_MAX_MB = 512 # least recently used LLM responses are evicted above this size
+LLM_CACHE_MAX_AGE_DAYS = 30 # LLM responses not used for this long are evicted
+PROMPT_TEMPLATE_VERSION = 3 # bump when prompts or their post-processing change, invalidates cached LLM responses
+CACHE_MEMORY_ITEMS = 256 # entries kept in the in-process tier of the Downloader cache
+CACHE_MAX_AGE_DAYS = 30 # Downloader cache entries not used for this long are evicted, keep it above the longest TTL
+CACHE_TTLS = { # seconds each Downloader endpoint stays cached, None caches forever
+    "quote": 15,
+    "company_information": 24 * 60 * 60,
+    "earnings_transcript_dates": 6 * 60 * 60,
+    "earnings_transcript": None, # a published transcript never changes
+    "analyst_price_targets": 6 * 60 * 60,
+    "insider_trades": 6 * 60 * 60,
+    "institutional_ownership": 24 * 60 * 60,
+    "stock_peers": 7 * 24 * 60 * 60,
+    "historical_earnings": 24 * 60 * 60,
+}
 CODING_AGENT_TYPES = [
     "Monte Carlo Price Estimator",
     "Monte Carlo Earnings Estimator",
@@ -156,6 +237,90 @@ FUNCTION_MAPPINGS = {
             "description": "A list of jsons with keys `date`, `open`, `high`, `low`, `close`, `volume`. Date is in the format of `YYYY-MM-DD` and other fields are the price and volume in float. List contains the price data for the last 252 days"
         }
     },
+    "get_price_column": {
+        "description": "Get a full column of the daily price history for the given ticker as a numpy array. Faster than get_price_chart_historical for statistics over long histories.",
+        "parameters": {
+            "ticker": {
+                "type": "string",
+                "description": "The ticker of the company"
+            },
+            "column": {
+                "type": "string",
+                "description": "One of `date`, `open`, `high`, `low`, `close`, `adjClose`, `volume`, `vwap`, `changePercent`"
+            }
+        },
+        "output_schema": {
+            "type": "numpy array",
+            "description": "A read-only numpy array with the column values ordered from oldest to latest day. Dates are strings in the format of `YYYY-MM-DD`, volume is an integer and the other columns are floats. Use np.array(...) if you need to modify it"
+        }
+    },
+    "get_financial_concepts": {
+        "description": "Get the XBRL concepts (line items of the financial statements and notes) reported in the latest 10-K or 10-Q filing for the given ticker.",
+        "parameters": {
+            "ticker": {
+                "type": "string",
+                "description": "The ticker of the company"
+            },
+            "report_type": {
+                "type": "string",
+                "description": "Either `10-K` (default) or `10-Q`"
+            }
+        },
+        "output_schema": {
+            "type": "list",
+            "description": "A sorted list of concept names like ['us-gaap:Assets', 'us-gaap:NetIncomeLoss', 'us-gaap:RevenueFromContractWithCustomerExcludingAssessedTax']. Concept names differ between companies, check this list before asking for a concept"
+        }
+    },
+    "get_financial_facts": {
+        "description": "Get every reported value of an XBRL concept from the latest 10-K or 10-Q filing for the given ticker, e.g. revenue for the current and prior periods.",
+        "parameters": {
+            "ticker": {
+                "type": "string",
+                "description": "The ticker of the company"
+            },
+            "concept": {
+                "type": "string",
+                "description": "The concept name with or without prefix, e.g. `us-gaap:Revenues` or `Revenues`"
+            },
+            "report_type": {
+                "type": "string",
+                "description": "Either `10-K` (default) or `10-Q`"
+            },
+            "dimensions": {
+                "type": "bool",
+                "description": "If True, also return values broken down by segment, product or geography. Defaults to False, only the consolidated company"
+            }
+        },
+        "output_schema": {
+            "type": "json",
+            "description": "A list of jsons with keys `concept`, `period_start`, `period_end`, `unit`, `dimensions`, `value`, latest period first. Dates are in the format of `YYYY-MM-DD`, `period_start` is an empty string for balance sheet (point in time) values. `unit` is like `USD`, `shares` or `USD/shares`. `dimensions` is an empty string for the consolidated company, or like `StatementBusinessSegmentsAxis=ServicesMember`. `value` is a float in plain units (not thousands or millions). Empty list if the concept is not reported"
+        }
+    },
+    "get_financial_fact": {
+        "description": "Get a single consolidated value of an XBRL concept from the latest 10-K or 10-Q filing for the given ticker.",
+        "parameters": {
+            "ticker": {
+                "type": "string",
+                "description": "The ticker of the company"
+            },
+            "concept": {
+                "type": "string",
+                "description": "The concept name with or without prefix, e.g. `us-gaap:Revenues` or `Revenues`"
+            },
+            "report_type": {
+                "type": "string",
+                "description": "Either `10-K` (default) or `10-Q`"
+            },
+            "period_end": {
+                "type": "string",
+                "description": "Optional period end date in the format of `YYYY-MM-DD`, defaults to the latest period"
+            }
+        },
+        "output_schema": {
+            "type": "float",
+            "description": "The value in plain units, for the quarter in a 10-Q and the fiscal year in a 10-K. None if the concept is not reported, so check for None"
+        }
+    },
     "get_analyst_price_targets": {
         "description": "Get the analyst price targets for the given ticker.",
         "parameters": {
@@ -0,0 +1,181 @@
+import os
+import re
+import json
+import hashlib
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from caching import SQLiteStore
+from articles import article_key
+from packer import pack_items, pack_document
+from tokens import count_tokens
+from transport import SingleFlight
+from llm import generate_llm_response
+from config import NEWS_DIGEST_MAX_ARTICLES, NEWS_DIGEST_CHUNK_ARTICLES, NEWS_DIGEST_ARTICLE_TOKENS, NEWS_DIGEST_REDUCE_TOKENS, \
+    NEWS_MAX_ARTICLES_PER_SITE, NEWS_RETENTION_DAYS, LLM_MAX_CONCURRENT_REQUESTS, PROMPT_TEMPLATE_VERSION
+from logger import get_logger
+logger = get_logger(__name__)
+
+DIGEST_MODEL = "gpt-4o-mini"
+
+class NewsDigester:
+    def __init__(self, path = os.path.join('cache', 'news_digests.sqlite3'), max_workers = LLM_MAX_CONCURRENT_REQUESTS):
+        """
+        Condenses the news of a ticker into a digest in two steps. Map: the articles are summarized in
+        chunks, concurrently, and every summary is stored by article url so an article is never
+        summarized twice. Reduce: the summaries are condensed into the digest, in groups first when
+        they do not fit one request. Digests are stored per set of articles, so the news agent's
+        extractions of one refresh all share one digest.
+        Args:
+            path (str): Path of the SQLite database file holding summaries and digests.
+            max_workers (int): Maximum number of map or reduce requests at once.
+        """
+        self.store = SQLiteStore(path)
+        # summaries outlive their articles by at most the news retention window
+        self.store.prune(max_age=NEWS_RETENTION_DAYS * 24 * 60 * 60)
+        self.max_workers = max_workers
+        self.flight = SingleFlight()
+
+    def _map(self, fn, values):
+        # a pool of its own, so a digest built from inside an LLM executor task can't starve that executor
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="digest") as pool:
+            futures = [pool.submit(contextvars.copy_context().run, fn, value) for value in values]
+            return [future.result() for future in futures]
+
+    def _summary_key(self, article):
+        return f"summary:v{PROMPT_TEMPLATE_VERSION}:{article_key(article)}"
+
+    def _summarize_chunk(self, ticker, articles):
+        articles_dump = ""
+        for number, article in enumerate(articles, start=1):
+            text = pack_document(article.get('text') or "", model=DIGEST_MODEL, budget=NEWS_DIGEST_ARTICLE_TOKENS).text
+            articles_dump += f"[{number}] {article.get('title')}\n{text}\n\n"
+        prompt = f"""
+        You are summarizing news articles for an analyst covering {ticker}. Summarize every article below in one or two factual sentences.
+        Keep the numbers, dates, names and what it means for {ticker}. No opinions of your own.
+
+        Articles:
+        ```
+        {articles_dump}
+        ```
+
+        Output Format:
+        A json object mapping the article number to its summary, e.g. {{"1": "...", "2": "..."}}
+
+        Do not start with ```json, start with the first bracket.
+        """
+        response = generate_llm_response(prompt, model=DIGEST_MODEL, temperature=0.2)
+        try:
+            summaries = json.loads(re.sub(r"^```(json)?|```$", "", response.strip()).strip())
+        except json.JSONDecodeError:
+            logger.warning(f"[Warning] Could not read the summaries of {len(articles)} {ticker} articles, using their titles")
+            summaries = {}
+        results = []
+        for number, article in enumerate(articles, start=1):
+            summary = summaries.get(str(number)) if isinstance(summaries, dict) else None
+            if summary:
+                self.store.set(self._summary_key(article), summary)
+            results.append(summary)
+        return results
+
+    def summarize(self, ticker, articles):
+        """
+        Get a short summary of every article, summarizing only the ones not summarized before.
+        Args:
+            ticker (str): The stock ticker symbol the articles are about.
+            articles (list): News articles from the stock_news endpoint.
+        Returns:
+            list: The summaries, in the order of the articles. An article that could not be summarized gets None.
+        """
+        summaries = [self.store.get(self._summary_key(article)) for article in articles]
+        for article, summary in zip(articles, summaries):
+            if summary is not None:
+                self.store.touch(self._summary_key(article))
+        missing = [index for index, summary in enumerate(summaries) if summary is None]
+        if missing:
+            logger.info(f"[Task] Summarizing {len(missing)} new {ticker} news articles, {len(articles) - len(missing)} already summarized")
+            chunks = [missing[start:start + NEWS_DIGEST_CHUNK_ARTICLES] for start in range(0, len(missing), NEWS_DIGEST_CHUNK_ARTICLES)]
+            results = self._map(lambda chunk: self._summarize_chunk(ticker, [articles[index] for index in chunk]), chunks)
+            for chunk, chunk_summaries in zip(chunks, results):
+                for index, summary in zip(chunk, chunk_summaries):
+                    summaries[index] = summary
+        return summaries
+
+    def _condense(self, ticker, notes):
+        prompt = f"""
+        You are writing a news digest for an analyst covering {ticker}. Below are notes on the news about {ticker}, latest first.
+        Condense them into a digest of at most 600 words: the main stories and themes, key events with their dates, the numbers that matter,
+        and how sentiment moved over time. Merge repeated stories. Keep it factual, no recommendations.
+
+        Notes:
+        ```
+        {notes}
+        ```
+
+        Return the digest only, no prefix, suffix, no starting with `here is`.
+        """
+        return generate_llm_response(prompt, model=DIGEST_MODEL, temperature=0.2)
+
+    def _groups(self, texts):
+        # greedy groups of whole texts within NEWS_DIGEST_REDUCE_TOKENS, at least two per group so every round shrinks
+        groups, group, tokens = [], [], 0
+        for text in texts:
+            text_tokens = count_tokens(text, DIGEST_MODEL)
+            if len(group) >= 2 and tokens + text_tokens > NEWS_DIGEST_REDUCE_TOKENS:
+                groups.append(group)
+                group, tokens = [], 0
+            group.append(text)
+            tokens += text_tokens
+        if group:
+            groups.append(group)
+        return groups
+
+    def _build(self, ticker, articles):
+        summaries = self.summarize(ticker, articles)
+        lines = [{"text": f"{(article.get('publishedDate') or '')[:10]} ({article.get('site')}) {article.get('title')}: {summary or ''}".strip(),
+                  "source": article.get('site')} for article, summary in zip(articles, summaries)]
+        packed = pack_items(lines, model=DIGEST_MODEL, max_per_source=NEWS_MAX_ARTICLES_PER_SITE, separator="\n", label="article summaries")
+        logger.info(f"[Context] {ticker} news digest: {packed.report()}")
+        notes = [lines[index]["text"] for index in packed.kept]
+
+        # reduce in rounds until a single digest is left
+        digests = self._map(lambda group: self._condense(ticker, "\n".join(group)), self._groups(notes)) if notes else [""]
+        while len(digests) > 1:
+            digests = self._map(lambda group: self._condense(ticker, "\n\n".join(group)), self._groups(digests))
+        return digests[0]
+
+    def digest(self, ticker, articles):
+        """
+        Get the news digest of a ticker. Concurrent callers for the same articles share one build.
+        Args:
+            ticker (str): The stock ticker symbol.
+            articles (list): News articles from the stock_news endpoint, latest first.
+        Returns:
+            str: The digest of the latest NEWS_DIGEST_MAX_ARTICLES articles.
+        """
+        articles = articles[:NEWS_DIGEST_MAX_ARTICLES]
+        fingerprint = hashlib.sha256("\n".join(article_key(article) for article in articles).encode('utf-8')).hexdigest()
+        key = f"digest:v{PROMPT_TEMPLATE_VERSION}:{ticker}:{fingerprint}"
+
+        def build():
+            digest = self.store.get(key)
+            if digest is None:
+                digest = self._build(ticker, articles)
+                self.store.set(key, digest)
+            return digest
+        return self.flight.do(key, build)
+
+_news_digester = None
+_news_digester_lock = threading.Lock()
+
+def get_news_digester():
+    """
+    Get the process-wide news digester, creating it on first use.
+    Returns:
+        NewsDigester: The shared news digester.
+    """
+    global _news_digester
+    with _news_digester_lock:
+        if _news_digester is None:
+            _news_digester = NewsDigester()
+        return _news_digester
@@ -1,27 +1,35 @@
 import os
 import logger
 import time
+import asyncio
+import functools
+import contextvars
 import pytz
 import json
-import shutil
-import shelve
-import requests
 import numpy as np
-from parser import Parser
-from datetime import datetime, timedelta
-from sec_edgar_downloader import Downloader as SECDownloader
+from concurrent.futures import Future, ThreadPoolExecutor
+from parser import get_parsed_filing_cache
+from transport import get_transport, iter_pages
+from quotes import get_quote_snapshot
+from filings import get_filing_store
+from xbrl import get_xbrl_fact_cache
+from macro import get_macro_snapshot
+from prices import get_price_store
+from caching import cached, get_cache
+from articles import get_article_store, article_key
 from llm import generate_llm_response
+from config import NEWS_PAGE_SIZE, NEWS_MAX_PAGES, HTTP_PAGE_WINDOW, ASYNC_DOWNLOADER_WORKERS
 from logger import get_logger
 logger = get_logger(__name__)
 
 class Downloader:
     def __init__(self, ticker = 'AAPL'):
         self.apiKey = os.environ.get('FMP_API_KEY')
+        self.transport = get_transport()
         self.cache_dir = 'cache'
         if not os.path.exists(self.cache_dir):
             os.makedirs(self.cache_dir)
-        self.cache_file = os.path.join(self.cache_dir, 'cache.db')
-        self.cache_expiry = timedelta(minutes=300)  # Cache expires after 300 minutes
+        self.cache = get_cache()
 
     def get_earnings_transcript(self, ticker):
         """
@@ -31,28 +39,37 @@ class Downloader:
         Returns:
             str: The latest earnings transcript content.
         """
-        # get latest earnings date
-        url = f"https://financialmodelingprep.com/api/v4/earning_call_transcript?symbol={ticker}&apikey={self.apiKey}"
-        latest_date = requests.get(url)
-        latest_date = latest_date.json()
+        latest_date = self._get_earnings_transcript_dates(ticker)
         if len(latest_date) == 0:
             logger.warning(f"[Warning] No earnings transcript found for {ticker}")
             return ""
 
         quarter, year = latest_date[0][0], latest_date[0][1]
 
-        # get transcript
-        url = f"https://financialmodelingprep.com/api/v3/earning_call_transcript/{ticker}?year={year}&quarter={quarter}&apikey={self.apiKey}"   
-        transcript = requests.get(url)
-        transcript = transcript.json()
-        transcript = transcript[0]
-        if "content" not in transcript:
+        transcript = self._get_earnings_transcript_content(ticker, year, quarter)
+        if transcript is None:
             logger.warning(f"[Warning] No transcript found for {ticker}")
             return ""
 
-        transcript = transcript["content"]
         return transcript
 
+    @cached("earnings_transcript_dates")
+    def _get_earnings_transcript_dates(self, ticker):
+        # get available earnings call dates, latest first
+        url = f"https://financialmodelingprep.com/api/v4/earning_call_transcript?symbol={ticker}&apikey={self.apiKey}"
+        latest_date = self.transport.get(url)
+        return latest_date.json()
+
+    @cached("earnings_transcript")
+    def _get_earnings_transcript_content(self, ticker, year, quarter):
+        url = f"https://financialmodelingprep.com/api/v3/earning_call_transcript/{ticker}?year={year}&quarter={quarter}&apikey={self.apiKey}"   
+        transcript = self.transport.get(url)
+        transcript = transcript.json()
+        if len(transcript) == 0 or "content" not in transcript[0]:
+            return None
+        return transcript[0]["content"]
+
+    @cached("company_information")
     def get_company_information(self, ticker):
         """
         Retrieve company information for a given ticker.
@@ -62,7 +79,7 @@ class Downloader:
             dict: A dictionary containing company information.
         """
         url = f"https://financialmodelingprep.com/api/v3/profile/{ticker}?apikey={self.apiKey}"
-        company_information = requests.get(url)
+        company_information = self.transport.get(url)
         company_information = company_information.json()
         if len(company_information) == 0:
             logger.warning(f"[Warning] No company information found for {ticker}")
@@ -79,55 +96,114 @@ class Downloader:
         Returns:
             dict: Parsed content of the SEC filing.
         """
-        cache_key = f"{ticker}_{report_type}"
-        
-        # Try to get from cache first
-        with shelve.open(self.cache_file) as cache:
-            if cache_key in cache:
-                cached_data = cache[cache_key]
-                if datetime.now() - cached_data['timestamp'] < self.cache_expiry:
-                    return Parser().parse_sec_filing(cached_data['content'])
-            
-        # If not in cache or expired, fetch new data
-        logger.info(f"[Task] Fetching new {report_type} filing")
-        dl = SECDownloader("Blotter", "info@blotter.fyi")
-        dl.get(report_type, ticker, limit=1, download_details=True)
-        
-        # Get current directory full path
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        # Construct path to the 10-K filing
-        filing_path = os.path.join(current_dir, "sec-edgar-filings", ticker, report_type)
-        
-        # Get the most recent filing folder
-        filing_folders = [f for f in os.listdir(filing_path) if os.path.isdir(os.path.join(filing_path, f))]
-        if not filing_folders:
-            return f"No {report_type} filing found"
-        latest_filing = max(filing_folders)
-        latest_filing_path = os.path.join(filing_path, latest_filing)
-        
-        # Find the HTML file
-        html_files = [f for f in os.listdir(latest_filing_path) if f.endswith('.html')]
-        if not html_files:
-            return f"No HTML file found in the {report_type} filing"
-        html_file = html_files[0]
-        html_file_path = os.path.join(latest_filing_path, html_file)
-        
-        # Read the contents of the HTML file
-        content = ""
-        with open(html_file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-        
-        # Remove the directory and its contents
-        shutil.rmtree("sec-edgar-filings", ignore_errors=True)
-        
-        # Store in cache
-        with shelve.open(self.cache_file) as cache:
-            cache[cache_key] = {
-                'content': content,
-                'timestamp': datetime.now()
-            }
-        
-        return Parser().parse_sec_filing(content)
+        return self.submit_sec_filing(report_type, ticker).result()
+
+    def download_sec_filing(self, report_type, ticker):
+        """
+        Download the latest SEC filing of a type into the filing store without parsing it, so the
+        sections are only parsed when an agent first reads them.
+        Args:
+            report_type (str): The type of SEC report (e.g., '10-K', '10-Q').
+            ticker (str): The stock ticker symbol.
+        Returns:
+            str: The accession number of the filing, or None if no filing was found.
+        """
+        return get_filing_store().get_accession(ticker, report_type)
+
+    def submit_sec_filing(self, report_type, ticker):
+        """
+        Fetch an SEC filing and start parsing it without waiting for the parse. With SEC_PARSE_WORKERS
+        set, filings submitted one after another parse in parallel on the parse worker processes.
+        Args:
+            report_type (str): The type of SEC report (e.g., '10-K', '10-Q').
+            ticker (str): The stock ticker symbol.
+        Returns:
+            concurrent.futures.Future: Future of the parsed content of the SEC filing, as returned by get_sec_filing.
+        """
+        filings = get_filing_store()
+        accession = filings.get_accession(ticker, report_type)
+        if accession is None:
+            future = Future()
+            future.set_result(f"No {report_type} filing found")
+            return future
+
+        # parsed sections are shared by accession, so the raw filing is only read and parsed once
+        parsed_filings = get_parsed_filing_cache()
+        sections = parsed_filings.peek(accession)
+        if sections is not None:
+            future = Future()
+            future.set_result(sections)
+            return future
+        return parsed_filings.submit(accession, filings.read(ticker, report_type, accession))
+
+    def get_financial_fact_table(self, report_type, ticker):
+        """
+        Get the inline XBRL fact table of the latest SEC filing of a type.
+        Args:
+            report_type (str): The type of SEC report (e.g., '10-K', '10-Q').
+            ticker (str): The stock ticker symbol.
+        Returns:
+            FactTable: The fact table, or None if no filing was found.
+        """
+        filings = get_filing_store()
+        accession = filings.get_accession(ticker, report_type)
+        if accession is None:
+            return None
+
+        fact_tables = get_xbrl_fact_cache()
+        table = fact_tables.peek(accession)
+        if table is not None:
+            return table
+        return fact_tables.get(accession, filings.read(ticker, report_type, accession))
+
+    def get_financial_concepts(self, ticker, report_type = "10-K"):
+        """
+        Get the XBRL concepts reported in the latest 10-K or 10-Q filing for a given ticker.
+        Args:
+            ticker (str): The stock ticker symbol.
+            report_type (str): '10-K' or '10-Q'.
+        Returns:
+            list: Sorted concept names, e.g. ['us-gaap:Assets', 'us-gaap:Revenues', ...].
+        """
+        table = self.get_financial_fact_table(report_type, ticker)
+        if table is None:
+            logger.warning(f"[Warning] No {report_type} filing found for {ticker}")
+            return []
+        return table.concepts()
+
+    def get_financial_facts(self, ticker, concept, report_type = "10-K", dimensions = False):
+        """
+        Get every reported value of an XBRL concept from the latest 10-K or 10-Q filing for a given ticker.
+        Args:
+            ticker (str): The stock ticker symbol.
+            concept (str): Concept name with or without prefix, e.g. 'us-gaap:Revenues' or 'Revenues'.
+            report_type (str): '10-K' or '10-Q'.
+            dimensions (bool): Include values broken down by segment, product, geography etc.
+        Returns:
+            list: Dicts with keys `concept`, `period_start`, `period_end`, `unit`, `dimensions`, `value`, latest first.
+        """
+        table = self.get_financial_fact_table(report_type, ticker)
+        if table is None:
+            logger.warning(f"[Warning] No {report_type} filing found for {ticker}")
+            return []
+        return table.records(concept, dimensions)
+
+    def get_financial_fact(self, ticker, concept, report_type = "10-K", period_end = None):
+        """
+        Get a single consolidated value of an XBRL concept from the latest 10-K or 10-Q filing for a given ticker.
+        Args:
+            ticker (str): The stock ticker symbol.
+            concept (str): Concept name with or without prefix, e.g. 'us-gaap:Revenues' or 'Revenues'.
+            report_type (str): '10-K' or '10-Q'.
+            period_end (str): Period end date 'YYYY-MM-DD', the latest one if None.
+        Returns:
+            float: The value, or None if it is not reported.
+        """
+        table = self.get_financial_fact_table(report_type, ticker)
+        if table is None:
+            logger.warning(f"[Warning] No {report_type} filing found for {ticker}")
+            return None
+        return table.value(concept, period_end)
 
     def get_financial_statements_10q(self, ticker):
         """
@@ -437,9 +513,7 @@ class Downloader:
         Returns:
             list: A list of GDP growth rate data for the last 12 periods.
         """
-        url = f"https://financialmodelingprep.com/api/v4/economic?name=GDP&apikey={self.apiKey}"
-        gdp = requests.get(url)
-        gdp = gdp.json()
+        gdp = get_macro_snapshot().records("gdp_growth_rate")
         gdp = gdp[:12]
         return gdp
 
@@ -449,9 +523,7 @@ class Downloader:
         Returns:
             list: A list of unemployment rate data for the last 12 periods.
         """
-        url = f"https://financialmodelingprep.com/api/v4/economic?name=unemploymentRate&apikey={self.apiKey}"
-        unemployment_rate = requests.get(url)
-        unemployment_rate = unemployment_rate.json()
+        unemployment_rate = get_macro_snapshot().records("unemployment_rate")
         unemployment_rate = unemployment_rate[:12]
         return unemployment_rate
 
@@ -461,9 +533,7 @@ class Downloader:
         Returns:
             list: A list of inflation rate data for the last 10 periods.
         """
-        url = f"https://financialmodelingprep.com/api/v4/economic?name=inflation&apikey={self.apiKey}"
-        inflation_rate = requests.get(url)
-        inflation_rate = inflation_rate.json()
+        inflation_rate = get_macro_snapshot().records("inflation_rate")
         inflation_rate = inflation_rate[:10]
         return inflation_rate
 
@@ -473,9 +543,7 @@ class Downloader:
         Returns:
             list: A list of retail sales data for the last 36 periods.
         """
-        url = f"https://financialmodelingprep.com/api/v4/economic?name=retailSales&apikey={self.apiKey}"
-        retail_sales = requests.get(url)
-        retail_sales = retail_sales.json()
+        retail_sales = get_macro_snapshot().records("retail_sales")
         retail_sales = retail_sales[:36]
         return retail_sales
 
@@ -485,9 +553,7 @@ class Downloader:
         Returns:
             list: A list of total vehicle sales data for the last 36 periods.
         """
-        url = f"https://financialmodelingprep.com/api/v4/economic?name=totalVehicleSales&apikey={self.apiKey}"
-        total_vehical_sales = requests.get(url)
-        total_vehical_sales = total_vehical_sales.json()
+        total_vehical_sales = get_macro_snapshot().records("total_vehical_sales")
         total_vehical_sales = total_vehical_sales[:36]
         return total_vehical_sales
 
@@ -497,13 +563,22 @@ class Downloader:
         Returns:
             list: A list of mortgage rate data for the last 24 periods.
         """
-        url = f"https://financialmodelingprep.com/api/v4/economic?name=30YearFixedRateMortgageAverage&apikey={self.apiKey}"
-        mortgage_rates = requests.get(url)
-        mortgage_rates = mortgage_rates.json()
+        mortgage_rates = get_macro_snapshot().records("mortgage_rates")
         mortgage_rates = [mortgage_rates[x] for x in range(0, len(mortgage_rates)) if x % 4 == 0]
         mortgage_rates = mortgage_rates[:24]
         return mortgage_rates
 
+    def get_quote(self, ticker):
+        """
+        Get the latest quote snapshot for a given ticker. The snapshot is shared by every
+        quote field getter and is refreshed after a few seconds.
+        Args:
+            ticker (str): The stock ticker symbol.
+        Returns:
+            dict: The quote payload with keys like 'price', 'pe', 'marketCap' and 'eps'.
+        """
+        return get_quote_snapshot().get(ticker)
+
     def get_current_ticker_price(self, ticker):
         """
         Get the current stock price for a given ticker.
@@ -512,10 +587,7 @@ class Downloader:
         Returns:
             float: The current stock price.
         """
-        url = f"https://financialmodelingprep.com/api/v3/quote/{ticker}?apikey={self.apiKey}"
-        current_price = requests.get(url)
-        current_price = current_price.json()
-        return current_price[0]["price"]
+        return self.get_quote(ticker)["price"]
 
     def get_price_chart_historical(self, ticker):
         """
@@ -525,12 +597,20 @@ class Downloader:
         Returns:
             list: A list of historical price data for the last 251 trading days.
         """
-        url = f"https://financialmodelingprep.com/api/v3/historical-price-full/{ticker}?apikey={self.apiKey}"
-        historical_price = requests.get(url)
-        historical_price = historical_price.json()
-        historical_price = historical_price["historical"]
-        return historical_price[:251]
+        return get_price_store().records(ticker, limit=251)
+
+    def get_price_column(self, ticker, column):
+        """
+        Get a full column of the daily price history for a given ticker, without copying it.
+        Args:
+            ticker (str): The stock ticker symbol.
+            column (str): The column, e.g. 'date', 'open', 'high', 'low', 'close' or 'volume'.
+        Returns:
+            numpy.ndarray: Read-only array with the column values, oldest first.
+        """
+        return get_price_store().column(ticker, column)
 
+    @cached("analyst_price_targets")
     def get_analyst_price_targets(self, ticker):
         """
         Get analyst price targets for a given ticker.
@@ -540,7 +620,7 @@ class Downloader:
             list: A list of the last 25 analyst price targets.
         """
         url = f"https://financialmodelingprep.com/api/v4/price-target?symbol={ticker}&apikey={self.apiKey}"
-        price_targets = requests.get(url)
+        price_targets = self.transport.get(url)
         price_targets = price_targets.json()
         price_targets = price_targets[:25]
         return price_targets
@@ -553,10 +633,7 @@ class Downloader:
         Returns:
             float: The current P/E ratio.
         """
-        url = f"https://financialmodelingprep.com/api/v3/quote/{ticker}?apikey={self.apiKey}"
-        current_price = requests.get(url)
-        current_price = current_price.json()
-        return current_price[0]["pe"]
+        return self.get_quote(ticker)["pe"]
 
     def get_market_cap(self, ticker):
         """
@@ -566,10 +643,7 @@ class Downloader:
         Returns:
             float: The current market capitalization.
         """
-        url = f"https://financialmodelingprep.com/api/v3/quote/{ticker}?apikey={self.apiKey}"
-        current_price = requests.get(url)
-        current_price = current_price.json()
-        return current_price[0]["marketCap"]
+        return self.get_quote(ticker)["marketCap"]
 
     def get_eps(self, ticker):
         """
@@ -579,11 +653,9 @@ class Downloader:
         Returns:
             float: The current EPS.
         """
-        url = f"https://financialmodelingprep.com/api/v3/quote/{ticker}?apikey={self.apiKey}"
-        current_price = requests.get(url)
-        current_price = current_price.json()
-        return current_price[0]["eps"]
+        return self.get_quote(ticker)["eps"]
 
+    @cached("insider_trades")
     def get_insider_trades(self, ticker):
         """
         Get recent insider trading data for a given ticker.
@@ -593,7 +665,7 @@ class Downloader:
             list: A list of recent insider trades.
         """
         url = f"https://financialmodelingprep.com/api/v4/insider-trading?symbol={ticker}&page=0&apikey={self.apiKey}"
-        insider_trades = requests.get(url)
+        insider_trades = self.transport.get(url)
         insider_trades = insider_trades.json()
         purchased = [item["securitiesTransacted"] for item in insider_trades if item["transactionType"] == "P-Purchase"]
         purchased = sum(purchased) if purchased else 0
@@ -601,6 +673,7 @@ class Downloader:
         sold = sum(sold) if sold else 0
         return insider_trades
 
+    @cached("institutional_ownership")
     def get_institutional_ownership(self, ticker):
         """
         Get the latest institutional ownership data for a given ticker.
@@ -610,12 +683,13 @@ class Downloader:
             list: A list of institutional ownership data.
         """
         url = f"https://financialmodelingprep.com/api/v3/institutional-holder/{ticker}?apikey={self.apiKey}"
-        institutional_ownership = requests.get(url)
+        institutional_ownership = self.transport.get(url)
         institutional_ownership = institutional_ownership.json()
         latest_date = institutional_ownership[0]["dateReported"]
         institutional_ownership = [item for item in institutional_ownership if item["dateReported"] == latest_date]
         return institutional_ownership
 
+    @cached("stock_peers")
     def get_stock_peers(self, ticker):
         """
         Get a list of peer stocks for a given ticker.
@@ -625,7 +699,7 @@ class Downloader:
             list: A list of peer stock tickers.
         """
         url = f"https://financialmodelingprep.com/api/v4/stock_peers?symbol={ticker}&apikey={self.apiKey}"
-        stock_peers = requests.get(url)
+        stock_peers = self.transport.get(url)
         stock_peers = stock_peers.json()
         if len(stock_peers) == 0:
             logger.warning(f"[Warning] No stock peers found for {ticker}")
@@ -643,29 +717,47 @@ class Downloader:
         Returns:
             list: A list of recent news articles.
         """
-        cache_key = f"{ticker}_news"
-        
-        with shelve.open(self.cache_file) as cache:
-            if cache_key in cache:
-                cached_data = cache[cache_key]
-                if datetime.now() - cached_data['timestamp'] < self.cache_expiry:
-                    return cached_data['content']
-        
-        all_news = []
-        for page in range(0, 25):
-            url = f"https://financialmodelingprep.com/api/v3/stock_news?tickers={ticker}&page={page}&apikey={self.apiKey}&limit=50"
-            news = requests.get(url)
-            news = news.json()
-            all_news.extend(news)
+        return list(self.iter_ticker_news(ticker))
+
+    def iter_ticker_news(self, ticker):
+        """
+        Stream recent news articles related to a given ticker, latest first, as their pages arrive.
+        Articles are kept in a persistent store, so a refresh only fetches pages until it reaches
+        the newest stored article. A cold fetch requests pages concurrently and stops at the first
+        short or empty page, or at the first article older than the store's retention window.
+        Args:
+            ticker (str): The stock ticker symbol.
+        Yields:
+            dict: A news article.
+        """
+        articles = get_article_store()
+        stored_news, fresh = articles.load(ticker)
+        if fresh:
+            yield from stored_news
+            return
+
+        def fetch_page(page):
+            url = f"https://financialmodelingprep.com/api/v3/stock_news?tickers={ticker}&page={page}&apikey={self.apiKey}&limit={NEWS_PAGE_SIZE}"
+            news = self.transport.get(url)
+            return news.json()
 
-        with shelve.open(self.cache_file) as cache:
-            cache[cache_key] = {
-                'content': all_news,
-                'timestamp': datetime.now()
-            }
+        stored_keys = {article_key(article) for article in stored_news}
+        # pages are latest first, so past the first aged out article every article would be dropped by save
+        reached_stored = lambda news: any(article_key(article) in stored_keys or articles.expired(article) for article in news)
+        # an incremental sync usually needs one or two pages, so don't request ahead
+        window = 1 if stored_keys else HTTP_PAGE_WINDOW
 
-        return all_news
+        new_news = []
+        for news in iter_pages(fetch_page, page_size=NEWS_PAGE_SIZE, max_pages=NEWS_MAX_PAGES, window=window, stop=reached_stored):
+            news = [article for article in news if article_key(article) not in stored_keys and not articles.expired(article)]
+            new_news.extend(news)
+            yield from news
 
+        all_news = articles.save(ticker, new_news, stored_news)
+        new_keys = {article_key(article) for article in new_news}
+        yield from [article for article in all_news if article_key(article) not in new_keys]
+
+    @cached("historical_earnings")
     def get_historical_earnings(self, ticker):
         """
         Get historical earnings data for a given ticker.
@@ -675,7 +767,7 @@ class Downloader:
             list: A list of the last 16 historical earnings data points.
         """
         url = f"https://financialmodelingprep.com/api/v3/historical/earning_calendar/{ticker}?apikey={self.apiKey}"
-        historical_earnings = requests.get(url)
+        historical_earnings = self.transport.get(url)
         historical_earnings = historical_earnings.json()
         historical_earnings = [item for item in historical_earnings if item["eps"] is not None]
         return historical_earnings[:16]
@@ -690,3 +782,76 @@ class Downloader:
         """
         return generate_llm_response(prompt, temperature=0.0)
 
+class AsyncDownloader:
+    def __init__(self, ticker = 'AAPL'):
+        """
+        Asyncio counterpart of Downloader with the same get_* and download_* method names, each returning a coroutine.
+        Calls run on a shared worker pool on top of the same transport, stores and caches as the
+        sync Downloader, so both see the same cache hits, rate limits and in-flight coalescing.
+        Use asyncio.gather to fan out.
+        """
+        self.downloader = Downloader(ticker)
+
+    def _prefetch_calls(self, ticker):
+        downloader = self.downloader
+        return {
+            "quote": functools.partial(downloader.get_quote, ticker),
+            "company_information": functools.partial(downloader.get_company_information, ticker),
+            "price_chart_historical": functools.partial(downloader.get_price_chart_historical, ticker),
+            "analyst_price_targets": functools.partial(downloader.get_analyst_price_targets, ticker),
+            "insider_trades": functools.partial(downloader.get_insider_trades, ticker),
+            "institutional_ownership": functools.partial(downloader.get_institutional_ownership, ticker),
+            "stock_peers": functools.partial(downloader.get_stock_peers, ticker),
+            "historical_earnings": functools.partial(downloader.get_historical_earnings, ticker),
+            "ticker_news": functools.partial(downloader.get_ticker_news, ticker),
+            "earnings_transcript": functools.partial(downloader.get_earnings_transcript, ticker),
+            # raw filings only, the SEC agent's lazy sections parse them on first use
+            "sec_filing_10k": functools.partial(downloader.download_sec_filing, "10-K", ticker),
+            "sec_filing_10q": functools.partial(downloader.download_sec_filing, "10-Q", ticker),
+            "gdp_growth_rate": downloader.get_gdp_growth_rate,
+        }
+
+    def start_prefetch(self, ticker):
+        """
+        Start fetching every data source of a ticker and return right away, so each agent can start
+        as soon as its own sources are in instead of waiting for the slowest source.
+        Args:
+            ticker (str): The stock ticker symbol.
+        Returns:
+            dict: Mapping of data source name to a concurrent.futures.Future of its result.
+        """
+        def log_failure(name, future):
+            if future.exception() is not None:
+                logger.warning(f"[Warning] Prefetching {name} for {ticker} failed: {future.exception()}")
+
+        futures = {}
+        for name, call in self._prefetch_calls(ticker).items():
+            futures[name] = _async_executor.submit(contextvars.copy_context().run, call)
+            futures[name].add_done_callback(functools.partial(log_failure, name))
+        return futures
+
+    async def prefetch(self, ticker):
+        """
+        Fetch every data source of a ticker concurrently, warming the caches used by the agents.
+        Args:
+            ticker (str): The stock ticker symbol.
+        Returns:
+            dict: Mapping of data source name to its result, or to the exception it raised.
+        """
+        futures = self.start_prefetch(ticker)
+        results = await asyncio.gather(*(asyncio.wrap_future(future) for future in futures.values()), return_exceptions=True)
+        return dict(zip(futures.keys(), results))
+
+_async_executor = ThreadPoolExecutor(max_workers=ASYNC_DOWNLOADER_WORKERS, thread_name_prefix="async-downloader")
+
+def _async_method(name):
+    async def method(self, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_async_executor, functools.partial(getattr(self.downloader, name), *args, **kwargs))
+    method.__name__ = name
+    method.__doc__ = getattr(Downloader, name).__doc__
+    return method
+
+for _name in dir(Downloader):
+    if _name.startswith(("get_", "download_")) and callable(getattr(Downloader, _name)):
+        setattr(AsyncDownloader, _name, _async_method(_name))
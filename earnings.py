@@ -7,9 +7,10 @@ import random
 from tqdm import tqdm
 from datetime import datetime, timedelta
 from downloader import Downloader
-from llm import generate_llm_response, self_reflect
+from llm import generate_llm_response, self_reflect, get_llm_executor
 from config import EARNINGS_TRANSCRIPT_INSIGHTS
 from sandbox import run_code
+from packer import pack_document
 from agent import Agent
 from logger import get_logger
 logger = get_logger(__name__)
@@ -18,14 +19,19 @@ class EarningsAgent(Agent):
     def __init__(self, ticker):
         self.ticker = ticker
 
-    def extract(self):
+    def extract_request(self):
         """
-        Extract insights from the latest earnings transcript for the given ticker.
+        Build the LLM request of extract, for running it through a BatchExecutor.
         Returns:
-            str: A string containing two paragraphs of insights (risks and strengths) 
-                 with a heading/title in the first line.
+            dict: Keyword arguments for generate_llm_response.
         """
         transcript = Downloader().get_earnings_transcript(self.ticker)
+        # long calls are cut down to the passages about results, guidance and risks
+        packed = pack_document(transcript, model="gpt-4o-mini", label="transcript",
+                               query="revenue margin growth guidance outlook demand risk headwind strength pricing")
+        if packed.dropped:
+            logger.info(f"[Context] {self.ticker} earnings: {packed.report()}")
+        transcript = packed.text
         prompt = f"""
         You are an expert financial analyst at reading earnings transcripts and drawing conclusions that only a PhD level quant can draw.
         You are given an unstructured earnings transcript and your job is to carefully read it, and extract some kind of a unique insight.
@@ -42,7 +48,16 @@ class EarningsAgent(Agent):
         No prefix, suffix, starting with `here is`, etc. Start directly with insights. Use numbers and statistics where you can.
         """
 
-        result = generate_llm_response(prompt, model="gpt-4o-mini")
+        return {"prompt": prompt, "model": "gpt-4o-mini"}
+
+    def extract(self):
+        """
+        Extract insights from the latest earnings transcript for the given ticker.
+        Returns:
+            str: A string containing two paragraphs of insights (risks and strengths) 
+                 with a heading/title in the first line.
+        """
+        result = generate_llm_response(**self.extract_request())
         return result
 
     def run(self):
@@ -53,10 +68,8 @@ class EarningsAgent(Agent):
         """
 
         logger.info(f"[Task] Extracting {EARNINGS_TRANSCRIPT_INSIGHTS} insights from earnings transcript data for {self.ticker}")
-        insights = []
-        for _ in tqdm(range(EARNINGS_TRANSCRIPT_INSIGHTS), desc="Extracting insights from earnings transcripts", unit="insight"):
-            data = self.extract()
-            insights.append(data)
+        futures = [get_llm_executor().submit(self.extract) for _ in range(EARNINGS_TRANSCRIPT_INSIGHTS)]
+        insights = [future.result() for future in tqdm(futures, desc="Extracting insights from earnings transcripts", unit="insight")]
         logger.info(f"[Task] Success, extracted {EARNINGS_TRANSCRIPT_INSIGHTS} insights from earnings transcript data for {self.ticker}")
         return insights
     
\ No newline at end of file
@@ -0,0 +1,207 @@
+import os
+import json
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from sec_edgar_downloader import Downloader as SECDownloader
+from transport import get_transport, SingleFlight
+from config import SEC_COMPANY_NAME, SEC_EMAIL, SEC_FILING_CHECK_MINUTES
+from logger import get_logger
+logger = get_logger(__name__)
+
+TICKER_MAPPING_URL = "https://www.sec.gov/files/company_tickers.json"
+SUBMISSIONS_URL = "https://data.sec.gov/submissions/CIK{cik}.json"
+
+class FilingStore:
+    def __init__(self, root = os.path.join('cache', 'filings'), check_interval = timedelta(minutes=SEC_FILING_CHECK_MINUTES)):
+        """
+        On-disk store of raw SEC filing HTML, one plain file per accession number.
+        Before downloading, the store asks EDGAR's submissions index whether a newer accession
+        exists, so an expired check only costs a full download when a new filing was published.
+        Downloads run in isolated temporary directories so concurrent runs do not clobber each other.
+        Args:
+            root (str): Root directory of the store.
+            check_interval (timedelta): How long a known latest accession is trusted before EDGAR is asked again.
+        """
+        self.root = root
+        self.check_interval = check_interval
+        if not os.path.exists(self.root):
+            os.makedirs(self.root)
+        self.user_agent = f"{SEC_COMPANY_NAME} {SEC_EMAIL}"
+        self.ciks = None
+        self.lock = threading.Lock()
+        self.flight = SingleFlight()
+
+    def _filing_dir(self, ticker, report_type):
+        return os.path.join(self.root, ticker, report_type)
+
+    def _index_path(self, ticker, report_type):
+        return os.path.join(self._filing_dir(ticker, report_type), 'index.json')
+
+    def _html_path(self, ticker, report_type, accession):
+        return os.path.join(self._filing_dir(ticker, report_type), f"{accession}.html")
+
+    def _write_atomic(self, path, content):
+        directory = os.path.dirname(path)
+        if not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def _read_index(self, ticker, report_type):
+        path = self._index_path(ticker, report_type)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(self._html_path(ticker, report_type, index['accession'])):
+            return None
+        index['checked'] = datetime.fromisoformat(index['checked'])
+        return index
+
+    def _write_index(self, ticker, report_type, accession):
+        index = {'accession': accession, 'checked': datetime.now().isoformat()}
+        self._write_atomic(self._index_path(ticker, report_type), json.dumps(index))
+
+    def _get_json(self, url):
+        response = get_transport().get(url, headers={"User-Agent": self.user_agent})
+        response.raise_for_status()
+        return response.json()
+
+    def get_cik(self, ticker):
+        """
+        Look up the zero-padded CIK of a ticker from EDGAR's ticker mapping.
+        Args:
+            ticker (str): The stock ticker symbol.
+        Returns:
+            str: The 10 digit CIK, or None if the ticker is unknown.
+        """
+        with self.lock:
+            ciks = self.ciks
+        if ciks is None:
+            path = os.path.join(self.root, 'company_tickers.json')
+            mapping = None
+            if os.path.exists(path) and datetime.now() - datetime.fromtimestamp(os.path.getmtime(path)) < timedelta(days=7):
+                with open(path, 'r') as f:
+                    mapping = json.load(f)
+            if mapping is None:
+                mapping = self._get_json(TICKER_MAPPING_URL)
+                self._write_atomic(path, json.dumps(mapping))
+            ciks = {str(item['ticker']).upper(): str(item['cik_str']).zfill(10) for item in mapping.values()}
+            with self.lock:
+                self.ciks = ciks
+        return ciks.get(ticker.upper())
+
+    def get_latest_accession(self, ticker, report_type):
+        """
+        Ask EDGAR's submissions index for the accession number of the latest filing of a type.
+        Args:
+            ticker (str): The stock ticker symbol.
+            report_type (str): The type of SEC report (e.g., '10-K', '10-Q').
+        Returns:
+            str: The latest accession number, or None if there is no such filing.
+        """
+        cik = self.get_cik(ticker)
+        if cik is None:
+            logger.warning(f"[Warning] No CIK found for {ticker}")
+            return None
+        submissions = self._get_json(SUBMISSIONS_URL.format(cik=cik))
+        recent = submissions['filings']['recent']
+        for accession, form in zip(recent['accessionNumber'], recent['form']):
+            if form == report_type:
+                return accession
+        return None
+
+    def _download(self, ticker, report_type):
+        download_dir = tempfile.mkdtemp(prefix='download-', dir=self.root)
+        try:
+            dl = SECDownloader(SEC_COMPANY_NAME, SEC_EMAIL, download_folder=download_dir)
+            dl.get(report_type, ticker, limit=1, download_details=True)
+
+            filing_path = os.path.join(download_dir, "sec-edgar-filings", ticker, report_type)
+            if not os.path.exists(filing_path):
+                return None, None
+            filing_folders = [f for f in os.listdir(filing_path) if os.path.isdir(os.path.join(filing_path, f))]
+            if not filing_folders:
+                return None, None
+            accession = max(filing_folders)
+            accession_path = os.path.join(filing_path, accession)
+
+            html_files = [f for f in os.listdir(accession_path) if f.endswith('.html')]
+            if not html_files:
+                return accession, None
+            with open(os.path.join(accession_path, html_files[0]), 'r', encoding='utf-8') as file:
+                content = file.read()
+            return accession, content
+        finally:
+            shutil.rmtree(download_dir, ignore_errors=True)
+
+    def _refresh(self, ticker, report_type):
+        index = self._read_index(ticker, report_type)
+        if index is not None and datetime.now() - index['checked'] < self.check_interval:
+            return index['accession']
+
+        try:
+            latest = self.get_latest_accession(ticker, report_type)
+        except Exception as e:
+            logger.warning(f"[Warning] Could not check EDGAR for a newer {report_type} for {ticker}: {e}")
+            latest = None
+            if index is not None:
+                return index['accession']
+
+        if latest is not None and os.path.exists(self._html_path(ticker, report_type, latest)):
+            self._write_index(ticker, report_type, latest)
+            return latest
+
+        logger.info(f"[Task] Fetching new {report_type} filing")
+        accession, content = self._download(ticker, report_type)
+        if accession is None or content is None:
+            return None
+        self._write_atomic(self._html_path(ticker, report_type, accession), content)
+        self._write_index(ticker, report_type, accession)
+        return accession
+
+    def get_accession(self, ticker, report_type):
+        """
+        Get the accession number of the latest stored filing, downloading it first if EDGAR has a newer one.
+        Args:
+            ticker (str): The stock ticker symbol.
+            report_type (str): The type of SEC report (e.g., '10-K', '10-Q').
+        Returns:
+            str: The accession number, or None if no filing could be found.
+        """
+        return self.flight.do((ticker, report_type), lambda: self._refresh(ticker, report_type))
+
+    def read(self, ticker, report_type, accession):
+        """
+        Read the raw HTML of a stored filing.
+        Args:
+            ticker (str): The stock ticker symbol.
+            report_type (str): The type of SEC report (e.g., '10-K', '10-Q').
+            accession (str): The accession number of the filing.
+        Returns:
+            str: The HTML content of the filing.
+        """
+        with open(self._html_path(ticker, report_type, accession), 'r', encoding='utf-8') as file:
+            return file.read()
+
+_filing_store = None
+_filing_store_lock = threading.Lock()
+
+def get_filing_store():
+    """
+    Get the process-wide filing store, creating it on first use.
+    Returns:
+        FilingStore: The shared filing store.
+    """
+    global _filing_store
+    with _filing_store_lock:
+        if _filing_store is None:
+            _filing_store = FilingStore()
+        return _filing_store
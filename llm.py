@@ -1,31 +1,591 @@
 import os
 import openai
+import httpx
 import re
 import json
+import time
+import random
+import hashlib
+import uuid
+import threading
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+from caching import SQLiteStore
+from transport import TokenBucket
+from tokens import count_tokens
+from usage import get_usage_tracker, calling_site
+from config import LLM_CACHE_POLICY, LLM_SEED, LLM_CACHE_MAX_MB, LLM_CACHE_MAX_AGE_DAYS, PROMPT_TEMPLATE_VERSION, \
+    LLM_MAX_CONCURRENT_REQUESTS, LLM_RATE_LIMITS, LLM_OUTPUT_TOKENS_ESTIMATE, LLM_TIMEOUTS, LLM_DEFAULT_TIMEOUT, LLM_MAX_RETRIES, \
+    LLM_BACKOFF_BASE, LLM_BACKOFF_CAP, LLM_POOL_SIZE, LLM_BATCH_POLL_SECONDS, LLM_BATCH_COMPLETION_WINDOW, \
+    LLM_BATCH_MAX_REQUESTS, LLM_BATCH_MAX_BYTES
 from logger import get_logger
 logger = get_logger(__name__)
 
-def generate_llm_response(prompt, model = "gpt-4o-mini", temperature = 1):
+RETRYABLE_FAILURES = {"rate_limit", "timeout", "connection", "server"}
+
+class LLMError(Exception):
+    def __init__(self, kind, model, cause):
+        """
+        A failed LLM request, after retries if the failure was retryable.
+        Args:
+            kind (str): One of 'rate_limit', 'quota', 'timeout', 'connection', 'server', 'auth', 'bad_request' or 'unknown'.
+            model (str): The OpenAI model name.
+            cause (Exception): The error raised by the OpenAI client.
+        """
+        super().__init__(f"{model} request failed ({kind}): {cause}")
+        self.kind = kind
+        self.model = model
+        self.cause = cause
+
+def classify_failure(error):
+    """
+    Classify an error raised by the OpenAI client.
+    Args:
+        error (Exception): The error.
+    Returns:
+        str: The failure kind, retryable if it is in RETRYABLE_FAILURES.
+    """
+    if isinstance(error, openai.RateLimitError):
+        # an exhausted quota does not recover by waiting
+        return "quota" if getattr(error, "code", None) == "insufficient_quota" else "rate_limit"
+    if isinstance(error, openai.APITimeoutError):
+        return "timeout"
+    if isinstance(error, openai.APIConnectionError):
+        return "connection"
+    if isinstance(error, (openai.AuthenticationError, openai.PermissionDeniedError)):
+        return "auth"
+    if isinstance(error, (openai.BadRequestError, openai.NotFoundError, openai.UnprocessableEntityError)):
+        return "bad_request"
+    if isinstance(error, openai.APIStatusError) and error.status_code >= 500:
+        return "server"
+    return "unknown"
+
+class LLMClient:
+    def __init__(self, api_key = None, timeouts = LLM_TIMEOUTS, max_retries = LLM_MAX_RETRIES, pool_size = LLM_POOL_SIZE):
+        """
+        Long-lived OpenAI client with a keep-alive connection pool, per-model timeouts and retries
+        with jittered exponential backoff on rate limits, timeouts, connection and server errors.
+        Args:
+            api_key (str): OpenAI API key. Defaults to the OPENAI_API_KEY environment variable.
+            timeouts (dict): Mapping of model to its request timeout in seconds, LLM_DEFAULT_TIMEOUT for others.
+            max_retries (int): Number of retries of a retryable failure.
+            pool_size (int): Number of keep-alive connections.
+        """
+        self.timeouts = timeouts
+        self.max_retries = max_retries
+        self.http_client = httpx.Client(limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size))
+        # retries are ours, so they are classified, logged and spread with jitter
+        self.client = openai.OpenAI(api_key=api_key or os.environ.get('OPENAI_API_KEY'), max_retries=0, http_client=self.http_client)
+
+    def _backoff(self, attempt, error):
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after is not None:
+            try:
+                # the server's hint is trusted, but a bad header must not stall the worker
+                return min(max(float(retry_after), 0), LLM_BACKOFF_CAP)
+            except ValueError:
+                pass
+        return random.uniform(0, min(LLM_BACKOFF_CAP, LLM_BACKOFF_BASE * (2 ** attempt)))
+
+    def complete(self, model, messages, **kwargs):
+        """
+        Create a chat completion.
+        Args:
+            model (str): The OpenAI model name.
+            messages (list): The chat messages.
+            **kwargs: Other chat completion parameters, e.g. temperature, n or seed.
+        Returns:
+            openai.types.chat.ChatCompletion: The completion.
+        Raises:
+            LLMError: If the request failed with a non-retryable error, or after the last retry.
+        """
+        timeout = self.timeouts.get(model, LLM_DEFAULT_TIMEOUT)
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.client.chat.completions.create(model=model, messages=messages, timeout=timeout, **kwargs)
+            except openai.OpenAIError as e:
+                kind = classify_failure(e)
+                if kind not in RETRYABLE_FAILURES or attempt == self.max_retries:
+                    raise LLMError(kind, model, e) from e
+                delay = self._backoff(attempt, e)
+                logger.warning(f"[Warning] {model} request failed ({kind}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+_llm_client = None
+_llm_client_lock = threading.Lock()
+
+def get_llm_client():
+    """
+    Get the process-wide OpenAI client, creating it on first use.
+    Returns:
+        LLMClient: The shared OpenAI client.
+    """
+    global _llm_client
+    with _llm_client_lock:
+        if _llm_client is None:
+            _llm_client = LLMClient()
+        return _llm_client
+
+class LLMExecutor:
+    def __init__(self, max_workers = LLM_MAX_CONCURRENT_REQUESTS, rate_limits = LLM_RATE_LIMITS):
+        """
+        Shared executor for LLM work. Submitted calls run on a bounded worker pool, and every request
+        to the API, from the pool or not, first waits for its model's requests-per-minute and
+        tokens-per-minute budgets, with tokens estimated before dispatch. Agents fan out by submitting
+        their calls and collecting the futures (or awaiting them with asyncio.wrap_future).
+        Args:
+            max_workers (int): Maximum number of submitted calls running at once.
+            rate_limits (dict): Mapping of model to its {"rpm": ..., "tpm": ...} limits.
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+        # full minute capacity, the API enforces its limits per minute, not per second
+        self.buckets = {model: (TokenBucket(limits["rpm"] / 60, limits["rpm"]), TokenBucket(limits["tpm"] / 60, limits["tpm"]))
+                        for model, limits in rate_limits.items()}
+
+    def acquire(self, model, tokens):
+        """
+        Block until a request of a model fits its rate limits, then take its share of them.
+        Args:
+            model (str): The OpenAI model name.
+            tokens (int): Estimated prompt plus completion tokens of the request.
+        """
+        buckets = self.buckets.get(model)
+        if buckets is None:
+            return
+        requests, budget = buckets
+        requests.acquire()
+        budget.acquire(tokens)
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Run a call that talks to the LLM, e.g. generate_llm_response or an agent's extract, on the pool.
+        The caller's context variables are visible inside the call.
+        Args:
+            fn (callable): The function to call.
+            *args: Positional arguments for fn.
+            **kwargs: Keyword arguments for fn.
+        Returns:
+            concurrent.futures.Future: Future of the return value of fn.
+        """
+        context = contextvars.copy_context()
+        return self.executor.submit(context.run, fn, *args, **kwargs)
+
+_llm_executor = None
+_llm_executor_lock = threading.Lock()
+
+def get_llm_executor():
+    """
+    Get the process-wide LLM executor, creating it on first use.
+    Returns:
+        LLMExecutor: The shared LLM executor.
+    """
+    global _llm_executor
+    with _llm_executor_lock:
+        if _llm_executor is None:
+            _llm_executor = LLMExecutor()
+        return _llm_executor
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+def get_llm_cache():
+    """
+    Get the process-wide LLM response store, creating and pruning it on first use.
+    Returns:
+        SQLiteStore: The shared LLM response store.
+    """
+    global _llm_cache
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = SQLiteStore(os.path.join('cache', 'llm.sqlite3'))
+            evicted = _llm_cache.prune(max_age=LLM_CACHE_MAX_AGE_DAYS * 24 * 60 * 60, max_bytes=LLM_CACHE_MAX_MB * 1024 * 1024)
+            if evicted:
+                logger.info(f"[Cache] Evicted {evicted} LLM responses")
+        return _llm_cache
+
+def _cacheable(temperature, seed):
+    if LLM_CACHE_POLICY == "deterministic":
+        return temperature == 0
+    if LLM_CACHE_POLICY == "seeded":
+        return temperature == 0 or seed is not None
+    return False
+
+def _llm_cache_key(model, temperature, seed, messages, n):
+    payload = json.dumps([PROMPT_TEMPLATE_VERSION, model, temperature, seed, n, messages], sort_keys=True)
+    return f"llm:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+# models that rejected the n parameter, their samples are requested one call each
+_models_without_n = set()
+
+def _record_usage(model, site, usage, latency, responses, batch = False):
+    # usage is the SDK object of a response, or the plain dict of a batch result line
+    if usage is not None and not isinstance(usage, dict):
+        usage = usage.model_dump()
+    usage = usage or {}
+    details = usage.get("prompt_tokens_details") or {}
+    get_usage_tracker().record(
+        model, site,
+        prompt_tokens=usage.get("prompt_tokens") or 0,
+        completion_tokens=usage.get("completion_tokens") or 0,
+        cached_tokens=details.get("cached_tokens") or 0,
+        latency=latency,
+        responses=responses,
+        batch=batch,
+    )
+
+def _complete(client, model, messages, site, **kwargs):
+    start = time.perf_counter()
+    response = client.complete(model, messages, **kwargs)
+    _record_usage(model, site, response.usage, time.perf_counter() - start, len(response.choices))
+    return response
+
+def _rejects_n(error):
+    return getattr(error, "param", None) == "n" or getattr(error, "code", None) == "n"
+
+def _create_completions(messages, model, temperature, seed, n, site):
+    client = get_llm_client()
+    kwargs = {} if seed is None else {"seed": seed}
+    executor = get_llm_executor()
+    prompt_tokens = sum(count_tokens(message["content"], model) for message in messages)
+    if n > 1 and model not in _models_without_n:
+        executor.acquire(model, prompt_tokens + n * LLM_OUTPUT_TOKENS_ESTIMATE)
+        try:
+            response = _complete(client, model, messages, site, temperature=temperature, n=n, **kwargs)
+            return [choice.message.content.strip() for choice in response.choices]
+        except LLMError as e:
+            # only a rejected n means the model can't sample several responses, other 400s (an oversized
+            # prompt, invalid messages) say nothing about the model
+            if e.kind != "bad_request" or not _rejects_n(e.cause):
+                raise
+            logger.warning(f"[Warning] {model} does not support n={n} ({e.cause}), requesting the samples concurrently")
+            _models_without_n.add(model)
+
+    def create():
+        executor.acquire(model, prompt_tokens + LLM_OUTPUT_TOKENS_ESTIMATE)
+        response = _complete(client, model, messages, site, temperature=temperature, **kwargs)
+        return response.choices[0].message.content.strip()
+    if n == 1:
+        return [create()]
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, create) for _ in range(n)]
+        return [future.result() for future in futures]
+
+def _messages(prompt, system):
+    # the system message goes first, a long system message shared by many calls is reused by the provider's prompt cache
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": prompt}
+    ]
+
+def _generate(prompt, model, temperature, seed, n, system, site = None):
+    messages = _messages(prompt, system)
+    site = site or calling_site()
+    cache_key = None
+    if _cacheable(temperature, seed):
+        cache_key = _llm_cache_key(model, temperature, seed, messages, n)
+        texts = get_llm_cache().get(cache_key)
+        if texts is not None:
+            get_llm_cache().touch(cache_key)
+            get_usage_tracker().record(model, site, responses=len(texts), cache_hit=True)
+            return texts
+
+    texts = _create_completions(messages, model, temperature, seed, n, site)
+    if cache_key is not None:
+        get_llm_cache().set(cache_key, texts)
+    return texts
+
+def generate_llm_response(prompt, model = "gpt-4o-mini", temperature = 1, seed = LLM_SEED, system = ""):
     """
-    Generate a response using OpenAI's language model.
+    Generate a response using OpenAI's language model. Responses are served from the LLM response
+    cache when LLM_CACHE_POLICY allows it for the call.
     Args:
         prompt (str): The input prompt for the language model.
         model (str): The name of the OpenAI model to use. Default is "gpt-4o-mini".
         temperature (float): The temperature parameter for response generation. Default is 1.
+        seed (int): Seed for (mostly) reproducible sampling. Defaults to LLM_SEED, None for no seed.
+        system (str): System message, put context shared by many calls here so it forms a cacheable prefix.
     Returns:
         str: The generated response from the language model.
     """
-    openai.api_key = os.environ.get('OPENAI_API_KEY')
-    response = openai.chat.completions.create(
-        model=model,
-        temperature=temperature,
-        messages=[
-            {"role": "system", "content": """"""},
-            {"role": "user", "content": prompt}
-        ],
-    )
-    text = response.choices[0].message.content.strip()
-    return text
+    return _generate(prompt, model, temperature, seed, 1, system)[0]
+
+def generate_llm_responses(prompt, n, model = "gpt-4o-mini", temperature = 1, seed = LLM_SEED, system = ""):
+    """
+    Generate several independent responses to the same prompt. The samples come from a single
+    request with the API's `n` parameter, so the prompt is only sent (and billed) once; models
+    that do not support `n` get n concurrent requests instead.
+    Args:
+        prompt (str): The input prompt for the language model.
+        n (int): Number of responses.
+        model (str): The name of the OpenAI model to use. Default is "gpt-4o-mini".
+        temperature (float): The temperature parameter for response generation. Default is 1.
+        seed (int): Seed for (mostly) reproducible sampling. Defaults to LLM_SEED, None for no seed.
+        system (str): System message, put context shared by many calls here so it forms a cacheable prefix.
+    Returns:
+        list: The n generated responses.
+    """
+    return _generate(prompt, model, temperature, seed, n, system)
+
+class OpenAIBatchBackend:
+    # batch requests are billed at LLM_BATCH_DISCOUNT of the regular price
+    discounted = True
+
+    def __init__(self, client = None):
+        """
+        OpenAI's batch API: the requests are uploaded as a JSONL file and answered within the
+        completion window at a discount.
+        Args:
+            client (openai.OpenAI): The OpenAI client. Defaults to the one of the shared LLMClient.
+        """
+        self.client = client or get_llm_client().client
+
+    def create(self, path, completion_window):
+        """
+        Upload a batch input file and start the batch.
+        Args:
+            path (str): Path of the JSONL file, one chat completion request per line.
+            completion_window (str): How long the provider may take, e.g. '24h'.
+        Returns:
+            str: The batch id.
+        """
+        with open(path, 'rb') as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(input_file_id=input_file.id, endpoint="/v1/chat/completions", completion_window=completion_window)
+        return batch.id
+
+    def status(self, batch_id):
+        """
+        Get the status of a batch.
+        Args:
+            batch_id (str): The batch id.
+        Returns:
+            str: The batch status, e.g. 'in_progress', 'completed' or 'expired'.
+        """
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id):
+        """
+        Download the result lines of a finished batch.
+        Args:
+            batch_id (str): The batch id.
+        Returns:
+            list: Dicts with keys `custom_id`, `response` and `error`, for answered and failed requests.
+        """
+        batch = self.client.batches.retrieve(batch_id)
+        lines = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                lines.extend(json.loads(line) for line in self.client.files.content(file_id).text.splitlines() if line.strip())
+        return lines
+
+class LocalBatchBackend:
+    # answered with regular requests, at the regular price
+    discounted = False
+
+    def __init__(self, respond = None):
+        """
+        Stand-in for the provider's batch API that answers a batch as soon as it is created,
+        for development runs and for checking a batch run without waiting for the provider.
+        Args:
+            respond (callable): Called with the body of each request, returns the chat completion as a dict.
+                                Defaults to sending the request through the shared LLMClient.
+        """
+        self.respond = respond or (lambda body: get_llm_client().complete(**body).model_dump())
+        self.batches = {}
+
+    def create(self, path, completion_window):
+        lines = []
+        with open(path, 'r') as f:
+            for line in f:
+                request = json.loads(line)
+                try:
+                    lines.append({"custom_id": request["custom_id"], "response": {"status_code": 200, "body": self.respond(request["body"])}, "error": None})
+                except Exception as e:
+                    lines.append({"custom_id": request["custom_id"], "response": None, "error": {"code": type(e).__name__, "message": str(e)}})
+        batch_id = f"local-{uuid.uuid4().hex}"
+        self.batches[batch_id] = lines
+        return batch_id
+
+    def status(self, batch_id):
+        return "completed"
+
+    def results(self, batch_id):
+        return self.batches.pop(batch_id)
+
+# batch statuses after which nothing changes anymore
+_BATCH_FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+class BatchExecutor:
+    def __init__(self, backend = None, poll_interval = LLM_BATCH_POLL_SECONDS, completion_window = LLM_BATCH_COMPLETION_WINDOW, batch_dir = os.path.join('cache', 'batches'),
+                 max_requests = LLM_BATCH_MAX_REQUESTS, max_bytes = LLM_BATCH_MAX_BYTES):
+        """
+        Collects LLM requests and sends them as one batch on flush, for runs over many tickers where
+        nobody waits for the answers. Requests already in the LLM response cache resolve right away,
+        answers are cached and their usage recorded like live calls, and requests the batch could not
+        answer are sent as regular requests so a flush always resolves every future.
+        Args:
+            backend: OpenAIBatchBackend, LocalBatchBackend or any object with create, status, results
+                     and a discounted flag. Defaults to OpenAIBatchBackend.
+            poll_interval (float): Seconds between status checks of a submitted batch.
+            completion_window (str): How long the provider may take, e.g. '24h'.
+            batch_dir (str): Directory where the batch input files are written.
+            max_requests (int): Maximum requests per batch, a flush sends several batches for more.
+            max_bytes (int): Maximum size of a batch input file.
+        """
+        self.backend = backend or OpenAIBatchBackend()
+        self.poll_interval = poll_interval
+        self.completion_window = completion_window
+        self.batch_dir = batch_dir
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        if not os.path.exists(self.batch_dir):
+            os.makedirs(self.batch_dir)
+        self.pending = []
+        self.lock = threading.Lock()
+
+    def submit(self, prompt, n = 1, model = "gpt-4o-mini", temperature = 1, seed = LLM_SEED, system = "", site = None):
+        """
+        Queue a request for the next batch. Takes the arguments of generate_llm_responses.
+        Args:
+            prompt (str): The input prompt for the language model.
+            n (int): Number of responses.
+            model (str): The name of the OpenAI model to use. Default is "gpt-4o-mini".
+            temperature (float): The temperature parameter for response generation. Default is 1.
+            seed (int): Seed for (mostly) reproducible sampling. Defaults to LLM_SEED, None for no seed.
+            system (str): System message, put context shared by many calls here so it forms a cacheable prefix.
+            site (str): Calling site the usage is recorded under, e.g. 'Analyst.bull_case'. Defaults to the caller.
+        Returns:
+            concurrent.futures.Future: Future of the list of n generated responses, resolved by flush.
+        """
+        messages = _messages(prompt, system)
+        site = site or calling_site()
+        future = Future()
+        cache_key = None
+        if _cacheable(temperature, seed):
+            cache_key = _llm_cache_key(model, temperature, seed, messages, n)
+            texts = get_llm_cache().get(cache_key)
+            if texts is not None:
+                get_llm_cache().touch(cache_key)
+                get_usage_tracker().record(model, site, responses=len(texts), cache_hit=True)
+                future.set_result(texts)
+                return future
+
+        body = {"model": model, "messages": messages, "temperature": temperature}
+        if n > 1:
+            body["n"] = n
+        if seed is not None:
+            body["seed"] = seed
+        request = {"prompt": prompt, "n": n, "model": model, "temperature": temperature, "seed": seed, "system": system,
+                   "site": site, "body": body, "cache_key": cache_key, "future": future,
+                   # usage of a request is recorded under the ticker and run it was submitted in
+                   "context": contextvars.copy_context()}
+        with self.lock:
+            self.pending.append(request)
+        return future
+
+    def _wait(self, batch_id):
+        failures = 0
+        while True:
+            try:
+                status = self.backend.status(batch_id)
+                if status in _BATCH_FINAL_STATUSES:
+                    return status
+                failures = 0
+            except Exception as e:
+                failures += 1
+                if failures > LLM_MAX_RETRIES:
+                    raise
+                logger.warning(f"[Warning] Could not check batch {batch_id} ({e}), checking again later")
+            time.sleep(self.poll_interval)
+
+    def _resolve(self, request, line, latency):
+        response = (line or {}).get("response") or {}
+        if response.get("status_code") != 200:
+            return False
+        body = response["body"]
+        texts = [choice["message"]["content"].strip() for choice in body["choices"]]
+        request["context"].run(_record_usage, request["model"], request["site"], body.get("usage"), latency, len(texts),
+                               batch=self.backend.discounted)
+        if request["cache_key"] is not None:
+            get_llm_cache().set(request["cache_key"], texts)
+        request["future"].set_result(texts)
+        return True
+
+    def _generate_live(self, request):
+        return request["context"].run(_generate, request["prompt"], request["model"], request["temperature"], request["seed"],
+                                      request["n"], request["system"], request["site"])
+
+    def _split(self, pending):
+        # the provider caps requests and bytes per batch, a large queue becomes several batches
+        parts, part, size = [], [], 0
+        for number, request in enumerate(pending):
+            request["custom_id"] = f"request-{number}"
+            line = (json.dumps({"custom_id": request["custom_id"], "method": "POST", "url": "/v1/chat/completions", "body": request["body"]}) + "\n").encode('utf-8')
+            if part and (len(part) >= self.max_requests or size + len(line) > self.max_bytes):
+                parts.append(part)
+                part, size = [], 0
+            part.append((request, line))
+            size += len(line)
+        if part:
+            parts.append(part)
+        return parts
+
+    def _create(self, part):
+        path = os.path.join(self.batch_dir, f"{uuid.uuid4().hex}.jsonl")
+        try:
+            with open(path, 'wb') as f:
+                for _, line in part:
+                    f.write(line)
+            return self.backend.create(path, self.completion_window)
+        finally:
+            os.remove(path)
+
+    def flush(self):
+        """
+        Send the queued requests as batches, wait for them and resolve their futures. Blocks for up
+        to the completion window.
+        """
+        with self.lock:
+            pending, self.pending = self.pending, []
+        if not pending:
+            return
+
+        start = time.perf_counter()
+        batches, unanswered = [], []
+        # every batch is created before waiting for any, the provider works on them side by side
+        for part in self._split(pending):
+            requests = [request for request, _ in part]
+            try:
+                batch_id = self._create(part)
+                logger.info(f"[Task] Submitted batch {batch_id} with {len(requests)} LLM requests")
+                batches.append((batch_id, requests))
+            except Exception as e:
+                logger.warning(f"[Warning] Batch of {len(requests)} LLM requests could not be submitted: {e}")
+                unanswered.extend(requests)
+
+        for batch_id, requests in batches:
+            lines = {}
+            try:
+                status = self._wait(batch_id)
+                if status != "failed":
+                    lines = {line["custom_id"]: line for line in self.backend.results(batch_id)}
+                logger.info(f"[Task] Batch {batch_id} {status} after {time.perf_counter() - start:.0f}s")
+            except Exception as e:
+                logger.warning(f"[Warning] Batch {batch_id} could not be collected: {e}")
+            latency = time.perf_counter() - start
+            unanswered.extend(request for request in requests if not self._resolve(request, lines.get(request["custom_id"]), latency))
+
+        if not unanswered:
+            return
+        # expired or failed requests are not lost, they are sent as regular requests instead
+        logger.warning(f"[Warning] {len(unanswered)} of {len(pending)} batched LLM requests were not answered, sending them as regular requests")
+        futures = [get_llm_executor().submit(self._generate_live, request) for request in unanswered]
+        for request, future in zip(unanswered, futures):
+            try:
+                request["future"].set_result(future.result())
+            except Exception as e:
+                request["future"].set_exception(e)
 
 def self_reflect(prompt, response):
     """
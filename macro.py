@@ -0,0 +1,147 @@
+import os
+import time
+import tempfile
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from transport import get_transport
+from config import MACRO_REFRESH_HOURS
+from logger import get_logger
+logger = get_logger(__name__)
+
+# snapshot series name -> FMP economic indicator name
+MACRO_SERIES = {
+    "gdp_growth_rate": "GDP",
+    "unemployment_rate": "unemploymentRate",
+    "inflation_rate": "inflation",
+    "retail_sales": "retailSales",
+    "total_vehical_sales": "totalVehicleSales",
+    "mortgage_rates": "30YearFixedRateMortgageAverage",
+}
+
+class MacroSnapshot:
+    def __init__(self, path = os.path.join('cache', 'macro.npz'), refresh_interval = MACRO_REFRESH_HOURS * 60 * 60):
+        """
+        Ticker independent snapshot of the US macro series. The full series are stored once on disk
+        in columnar form (a date and a value array per series) and preloaded into memory, so every
+        process and every ticker reads them locally. The snapshot is refreshed when it is older than
+        the refresh interval, or on a schedule by running `python macro.py`.
+        Args:
+            path (str): Path of the .npz snapshot file.
+            refresh_interval (float): Seconds after which the snapshot is refreshed.
+        """
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self.refresh_interval = refresh_interval
+        self.columns = None
+        self.refreshed = 0
+        self.lock = threading.Lock()
+
+    def _fetch(self, indicator):
+        url = f"https://financialmodelingprep.com/api/v4/economic?name={indicator}&apikey={os.environ.get('FMP_API_KEY')}"
+        series = get_transport().get(url)
+        return series.json()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return False
+        with np.load(self.path) as data:
+            self.columns = {key: data[key] for key in data.files}
+        self.refreshed = float(self.columns.pop("refreshed"))
+        return True
+
+    def _acquire_refresh_lock(self):
+        try:
+            os.close(os.open(self.lock_path, os.O_CREAT | os.O_EXCL))
+            return True
+        except FileExistsError:
+            # another process is refreshing, unless it died holding the lock
+            if time.time() - os.path.getmtime(self.lock_path) > 120:
+                os.unlink(self.lock_path)
+                return self._acquire_refresh_lock()
+            return False
+
+    def refresh(self):
+        """
+        Download every macro series and atomically replace the snapshot on disk.
+        """
+        logger.info("[Task] Refreshing macro snapshot")
+        with ThreadPoolExecutor(max_workers=len(MACRO_SERIES)) as executor:
+            payloads = dict(zip(MACRO_SERIES, executor.map(self._fetch, MACRO_SERIES.values())))
+
+        columns = {}
+        for name, payload in payloads.items():
+            columns[f"{name}_date"] = np.array([str(item["date"]) for item in payload], dtype="U10")
+            columns[f"{name}_value"] = np.array([item["value"] for item in payload], dtype=np.float64)
+        refreshed = time.time()
+
+        directory = os.path.dirname(self.path) or '.'
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.npz')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, refreshed=np.float64(refreshed), **columns)
+        os.replace(tmp_path, self.path)
+        self.columns = columns
+        self.refreshed = refreshed
+
+    def _ensure_fresh(self):
+        with self.lock:
+            if self.columns is None:
+                self._load()
+            if self.columns is not None and time.time() - self.refreshed < self.refresh_interval:
+                return
+
+            # a stale snapshot on disk may already have been refreshed by another process
+            if self._load() and time.time() - self.refreshed < self.refresh_interval:
+                return
+
+            if self._acquire_refresh_lock():
+                try:
+                    self.refresh()
+                finally:
+                    os.unlink(self.lock_path)
+                return
+
+            # someone else is refreshing, use the stale snapshot or wait for the new one
+            while self.columns is None and os.path.exists(self.lock_path):
+                time.sleep(0.5)
+                self._load()
+            if self.columns is None and not self._load():
+                self.refresh()
+
+    def series(self, name):
+        """
+        Get the full series as columns.
+        Args:
+            name (str): Name of the series, one of MACRO_SERIES.
+        Returns:
+            tuple: (dates, values) numpy arrays, latest first.
+        """
+        self._ensure_fresh()
+        return self.columns[f"{name}_date"], self.columns[f"{name}_value"]
+
+    def records(self, name):
+        """
+        Get the full series in the row format returned by the FMP economic endpoint.
+        Args:
+            name (str): Name of the series, one of MACRO_SERIES.
+        Returns:
+            list: A list of dicts with keys `date` and `value`, latest first.
+        """
+        dates, values = self.series(name)
+        return [{"date": date, "value": value} for date, value in zip(dates.tolist(), values.tolist())]
+
+_snapshot = MacroSnapshot()
+
+def get_macro_snapshot():
+    """
+    Get the process-wide macro snapshot.
+    Returns:
+        MacroSnapshot: The shared macro snapshot.
+    """
+    return _snapshot
+
+if __name__ == "__main__":
+    # meant to be scheduled (e.g. cron) so that runs always find a fresh snapshot
+    get_macro_snapshot().refresh()
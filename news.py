@@ -7,8 +7,9 @@ import random
 from tqdm import tqdm
 from datetime import datetime, timedelta
 from downloader import Downloader
-from llm import generate_llm_response, self_reflect
+from llm import generate_llm_response, self_reflect, get_llm_executor
 from config import NEWS_ANALYST_TYPES, NEWS_INSIGHTS
+from digest import get_news_digester
 from sandbox import run_code
 from agent import Agent
 from logger import get_logger
@@ -18,31 +19,24 @@ class NewsAgent(Agent):
     def __init__(self, ticker):
         self.ticker = ticker
 
-    def extract(self):
+    def extract_request(self):
         """
-        Extract insights from news data related to the ticker.
-        This method fetches news data, processes it, and generates insights
-        based on a randomly selected analyst type.
+        Build the LLM request of extract, for running it through a BatchExecutor.
         Returns:
-            str: A paragraph of insights with a heading/title in the first line,
-                 based on the news data and selected analyst type.
+            dict: Keyword arguments for generate_llm_response.
         """
 
-        news_data = Downloader().get_ticker_news(self.ticker)
-        news_data_dump = ""
-        for item in news_data:
-            news_data_dump += f"{item['title']}\n{item['text']}\n\n"
-
+        news_data_dump = self.digest()
         analyst_type = random.choice(NEWS_ANALYST_TYPES)
         prompt = f"""
         You are an expert financial analyst at reading news about {self.ticker} and drawing conclusions that only a PhD level quant can draw.
-        You are given an unstructured news data and your job is to carefully read it, and extract some kind of a unique insight.
+        You are given a digest of the news and your job is to carefully read it, and extract some kind of a unique insight.
         We are going to use these insights to make decisions about building a rating (buy, hold, sell) for the stock.
         You have to be technical, quantitative, use numbers, and most of all, creative. You cannot act like a 2 year old.
 
         The type of agent you have to act like is: {analyst_type} - make sure your analysis revolves around this theme.
 
-        Here is the data dump from the last 6 months of news:
+        Here is the digest of the last 6 months of news:
         ```
         {news_data_dump}
         ```
@@ -53,7 +47,26 @@ class NewsAgent(Agent):
         Again, your analyst should revolve around {analyst_type} since thats what you are.
         """
 
-        result = generate_llm_response(prompt, model="gpt-4o-mini")
+        return {"prompt": prompt, "model": "gpt-4o-mini"}
+
+    def digest(self):
+        """
+        Get the digest of the ticker's news, built once per news refresh and shared by every extraction.
+        Returns:
+            str: The news digest.
+        """
+        return get_news_digester().digest(self.ticker, Downloader().get_ticker_news(self.ticker))
+
+    def extract(self):
+        """
+        Extract insights from news data related to the ticker.
+        This method fetches news data, processes it, and generates insights
+        based on a randomly selected analyst type.
+        Returns:
+            str: A paragraph of insights with a heading/title in the first line,
+                 based on the news data and selected analyst type.
+        """
+        result = generate_llm_response(**self.extract_request())
         return result
 
     def run(self):
@@ -64,11 +77,11 @@ class NewsAgent(Agent):
             list: A list of insights extracted from news data.
         """
         
-        insights = []
+        logger.info(f"[Task] Building a news digest for {self.ticker}")
+        self.digest()
         logger.info(f"[Task] Extracting {NEWS_INSIGHTS} insights from news data for {self.ticker}")
-        for _ in tqdm(range(NEWS_INSIGHTS), desc="Extracting insights from news", unit="insight"):
-            data = self.extract()
-            insights.append(data)
+        futures = [get_llm_executor().submit(self.extract) for _ in range(NEWS_INSIGHTS)]
+        insights = [future.result() for future in tqdm(futures, desc="Extracting insights from news", unit="insight")]
 
         logger.info(f"[Task] Success, extracted {NEWS_INSIGHTS} insights from news data for {self.ticker}")
         return insights
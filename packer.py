@@ -0,0 +1,197 @@
+import re
+from collections import Counter
+from tokens import count_tokens
+from config import LLM_CONTEXT_BUDGETS, LLM_DEFAULT_CONTEXT_BUDGET, CONTEXT_CHUNK_TOKENS, CONTEXT_DUPLICATE_SIMILARITY
+from logger import get_logger
+logger = get_logger(__name__)
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9.%$'-]*")
+
+# near duplicates (syndicated articles, repeated boilerplate) share their opening, so only that is compared
+_SHINGLE_WORDS = 80
+_SHINGLE_SIZE = 3
+
+# packing stops once less than this is left of the budget
+_MIN_ITEM_TOKENS = 32
+
+# words too common to say anything about relevance
+_STOPWORDS = {"a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it", "its", "of", "on", "or", "that", "the", "this", "to", "with"}
+
+def context_budget(model):
+    """
+    Get the number of source material tokens a prompt for a model may hold.
+    Args:
+        model (str): The OpenAI model name.
+    Returns:
+        int: The token budget.
+    """
+    return LLM_CONTEXT_BUDGETS.get(model, LLM_DEFAULT_CONTEXT_BUDGET)
+
+def _terms(text):
+    return {word.strip(".'-") for word in _WORD.findall(text.lower())} - _STOPWORDS
+
+def _shingles(text):
+    words = _WORD.findall(text.lower())[:_SHINGLE_WORDS]
+    return {tuple(words[i:i + _SHINGLE_SIZE]) for i in range(max(len(words) - _SHINGLE_SIZE + 1, 1))}
+
+def _similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+class PackedContext:
+    def __init__(self, text, kept, dropped, tokens, budget, label):
+        """
+        Result of packing source material into a token budget.
+        Args:
+            text (str): The packed source material, ready to put into a prompt.
+            kept (list): Indexes of the packed items.
+            dropped (list): (index, reason) of every item left out, reason is 'budget', 'duplicate' or 'source'.
+            tokens (int): Tokens of the packed text.
+            budget (int): The token budget.
+            label (str): What the items are, e.g. 'news articles', for the report.
+        """
+        self.text = text
+        self.kept = kept
+        self.dropped = dropped
+        self.tokens = tokens
+        self.budget = budget
+        self.label = label
+
+    def report(self):
+        """
+        Describe what was packed and what was dropped.
+        Returns:
+            str: e.g. 'packed 180 of 1250 news articles (23950/24000 tokens), dropped 1040 over budget, 30 near duplicates'.
+        """
+        total = len(self.kept) + len(self.dropped)
+        report = f"packed {len(self.kept)} of {total} {self.label} ({self.tokens}/{self.budget} tokens)"
+        reasons = Counter(reason for _, reason in self.dropped)
+        names = {"budget": "over budget", "duplicate": "near duplicates", "source": "over the per source limit"}
+        if reasons:
+            report += ", dropped " + ", ".join(f"{count} {names[reason]}" for reason, count in reasons.most_common())
+        return report
+
+def pack_items(items, model = "gpt-4o-mini", budget = None, query = "", recency_weight = 1.0, max_per_source = None,
+               separator = "\n\n", label = "items"):
+    """
+    Fit items such as news articles into a token budget. Items are ranked by recency (their position,
+    first is newest) and relevance (share of the query terms they mention), then taken greedily while
+    skipping near duplicates of items already taken and items of a source that hit max_per_source.
+    The packed items keep their original order.
+    Args:
+        items (list): Dicts with a `text` and optionally a `source`, newest first.
+        model (str): The OpenAI model the prompt is for, sets the tokenizer and the default budget.
+        budget (int): Token budget, context_budget(model) if None.
+        query (str): Words that make an item relevant, e.g. the ticker and the analyst's focus.
+        recency_weight (float): Weight of recency against relevance, 0 to rank by relevance only.
+        max_per_source (int): Maximum number of items per source, unlimited if None.
+        separator (str): Put between packed items.
+        label (str): What the items are, e.g. 'news articles', for the report.
+    Returns:
+        PackedContext: The packed text and a report of what was dropped.
+    """
+    budget = context_budget(model) if budget is None else budget
+    query_terms = _terms(query)
+    separator_tokens = count_tokens(separator, model)
+
+    def score(index):
+        recency = 1 - index / len(items)
+        relevance = len(query_terms & _terms(items[index]["text"])) / len(query_terms) if query_terms else 0.0
+        return recency_weight * recency + relevance
+
+    # stable sort, so equally scored items keep their order
+    ranked = sorted(range(len(items)), key=score, reverse=True)
+    kept, dropped, kept_shingles = [], [], []
+    sources = Counter()
+    tokens = 0
+    for position, index in enumerate(ranked):
+        if budget - tokens < _MIN_ITEM_TOKENS:
+            # full, nothing meaningful fits anymore
+            dropped.extend((index, "budget") for index in ranked[position:])
+            break
+        item = items[index]
+        source = item.get("source")
+        if max_per_source is not None and source is not None and sources[source] >= max_per_source:
+            dropped.append((index, "source"))
+            continue
+        item_tokens = count_tokens(item["text"], model) + (separator_tokens if kept else 0)
+        if tokens + item_tokens > budget:
+            dropped.append((index, "budget"))
+            continue
+        shingles = _shingles(item["text"])
+        if any(_similarity(shingles, other) >= CONTEXT_DUPLICATE_SIMILARITY for other in kept_shingles):
+            dropped.append((index, "duplicate"))
+            continue
+        kept.append(index)
+        kept_shingles.append(shingles)
+        sources[source] += 1
+        tokens += item_tokens
+
+    kept.sort()
+    text = separator.join(items[index]["text"] for index in kept)
+    return PackedContext(text, kept, dropped, tokens, budget, label)
+
+def _pieces(line, model):
+    # a single line can be a whole section (parsed filings have few line breaks), split it at sentences
+    if count_tokens(line, model) <= CONTEXT_CHUNK_TOKENS:
+        return [line]
+    pieces = []
+    for sentence in re.split(r"(?<=[.!?])\s+", line):
+        # tables flattened to text have no sentence ends at all
+        step = CONTEXT_CHUNK_TOKENS * 4
+        pieces.extend(sentence[start:start + step] for start in range(0, len(sentence), step))
+    return pieces
+
+def _chunks(text, model):
+    # whole lines (speaker turns, paragraphs) are merged until a chunk reaches CONTEXT_CHUNK_TOKENS
+    chunks, pieces, tokens = [], [], 0
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        for piece in _pieces(line, model):
+            pieces.append(piece)
+            tokens += count_tokens(piece, model)
+            if tokens >= CONTEXT_CHUNK_TOKENS:
+                chunks.append("\n".join(pieces))
+                pieces, tokens = [], 0
+    if pieces:
+        chunks.append("\n".join(pieces))
+    return chunks
+
+def pack_document(text, model = "gpt-4o-mini", budget = None, query = "", label = "document"):
+    """
+    Fit a long document such as a transcript or a filing section into a token budget. A document
+    that fits is returned unchanged, otherwise it is split into chunks of whole lines, the chunks
+    most relevant to the query are kept (earlier ones first on a tie, repeated boilerplate is
+    dropped), and left out stretches are marked with [...].
+    Args:
+        text (str): The document.
+        model (str): The OpenAI model the prompt is for, sets the tokenizer and the default budget.
+        budget (int): Token budget, context_budget(model) if None.
+        query (str): Words that make a chunk relevant.
+        label (str): What the document is, e.g. 'transcript', for the report.
+    Returns:
+        PackedContext: The packed text and a report of what was dropped, counted in chunks.
+    """
+    text = text or ""
+    budget = context_budget(model) if budget is None else budget
+    tokens = count_tokens(text, model)
+    if tokens <= budget:
+        return PackedContext(text, [0] if text else [], [], tokens, budget, f"{label} chunks")
+
+    chunks = _chunks(text, model)
+    # packing with the gap marker as separator budgets for a marker between any two kept chunks
+    packed = pack_items([{"text": chunk} for chunk in chunks], model, budget - count_tokens("[...]\n", model),
+                        query=query, recency_weight=0.0, separator="\n[...]\n", label=f"{label} chunks")
+    parts = []
+    for position, index in enumerate(packed.kept):
+        if (position == 0 and index > 0) or (position > 0 and index > packed.kept[position - 1] + 1):
+            parts.append("[...]")
+        parts.append(chunks[index])
+    if packed.kept and packed.kept[-1] < len(chunks) - 1:
+        parts.append("[...]")
+    packed.text = "\n".join(parts)
+    packed.tokens = count_tokens(packed.text, model)
+    packed.budget = budget
+    return packed
@@ -4,32 +4,289 @@ import pytz
 import json
 import shutil
 import shelve
+import hashlib
+import functools
+import sys
+import threading
+import multiprocessing
+import numpy as np
 from datetime import datetime, timedelta
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, Tag, NavigableString, CData
 from collections import defaultdict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from transport import SingleFlight
+from config import SEC_PARSER_ENGINE, SEC_PARSE_WORKERS
+from tokens import count_tokens
 from logger import get_logger
 logger = get_logger(__name__)
 
-class Parser:
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+PARSER_VERSION = 2 # bump whenever parse_sec_filing output changes, invalidates parsed section caches
+XBRL_PARSER_VERSION = 1 # bump whenever parse_xbrl_facts output changes, invalidates fact table caches
+
+# elements that start a new text block, text inside anything else (span, font, b, ix:*) flows into the enclosing block
+BLOCK_TAGS = {'html', 'body', 'div', 'p', 'br', 'hr', 'table', 'tr', 'td', 'th', 'ul', 'ol', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'section', 'blockquote', 'pre'}
+FLUSH = None
+
+def _is_bold(style):
+    return 'font-weight:700' in style or 'font-weight: 700' in style
+
+class _BlockTarget:
+    """
+    Parser target (lxml's SAX-like interface, also driven by the BeautifulSoup walker) that turns the
+    document into a flat list of events in document order: text pieces, FLUSH at block boundaries and
+    ('heading', text) where a bold span/div starting with "Item " switches sections. Every text node
+    is recorded once, no matter how deeply its span/div ancestors are nested.
+    """
     def __init__(self):
+        self.events = []
+        self.skip = 0
+        self.capture = None
+        self.in_data = False
+
+    def start(self, tag, attrib):
+        tag = tag.rsplit('}', 1)[-1].lower()
+        self.in_data = False
+        if tag in ('script', 'style'):
+            self.skip += 1
+        if tag in BLOCK_TAGS:
+            self.events.append(FLUSH)
+        if self.capture is not None:
+            self.capture['depth'] += 1
+        elif tag in ('span', 'div') and _is_bold(attrib.get('style', '')):
+            # can't tell whether this is a section heading until its text is complete
+            self.capture = {'depth': 1, 'mark': len(self.events), 'pieces': []}
+
+    def data(self, data):
+        if self.skip:
+            return
+        self.events.append(data)
+        if self.capture is not None:
+            if self.in_data:
+                self.capture['pieces'][-1] += data
+            else:
+                self.capture['pieces'].append(data)
+        self.in_data = True
+
+    def end(self, tag):
+        tag = tag.rsplit('}', 1)[-1].lower()
+        self.in_data = False
+        if tag in ('script', 'style'):
+            self.skip -= 1
+        if self.capture is not None:
+            self.capture['depth'] -= 1
+            if self.capture['depth'] == 0:
+                # same text as BeautifulSoup's get_text(strip=True), so section keys stay the same
+                heading = ''.join(piece.strip() for piece in self.capture['pieces'])
+                if heading.lower().startswith("item "):
+                    del self.events[self.capture['mark']:]
+                    self.events.append(('heading', heading))
+                self.capture = None
+        if tag in BLOCK_TAGS:
+            self.events.append(FLUSH)
+
+    def comment(self, text):
+        self.in_data = False
+
+    def close(self):
+        return self.events
+
+def _local_name(name):
+    # '{namespace}nonFraction' (lxml XML mode), 'ix:nonfraction' (HTML parsers) -> 'nonfraction'
+    return name.rsplit('}', 1)[-1].split(':')[-1].lower()
+
+def _xbrl_number(text, number_format):
+    # inline XBRL transformation formats, see ixt:num-dot-decimal, ixt:num-comma-decimal, ixt:fixed-zero
+    number_format = _local_name(number_format or '').replace('-', '')
+    text = text.strip()
+    if number_format in ('fixedzero', 'zerodash') or text in ('-', '\u2013', '\u2014'):
+        return 0.0
+    if number_format == 'numcommadecimal':
+        text = text.replace('.', '').replace(',', '.')
+    text = re.sub(r'[^0-9.]', '', text)
+    return float(text) if text else None
+
+class _FactTarget:
+    """
+    Parser target that collects the numeric inline XBRL facts (ix:nonFraction) of a filing together
+    with the contexts (period and dimensions) and units they refer to, from ix:resources.
+    """
+    def __init__(self):
+        self.facts = []
+        self.open_facts = []
+        self.contexts = {}
+        self.units = {}
+        self.context = None
+        self.unit = None
+        self.field = None
+
+    def start(self, tag, attrib):
+        tag = _local_name(tag)
+        attrib = {_local_name(key): value for key, value in attrib.items()}
+        if tag == 'nonfraction':
+            self.open_facts.append((attrib, []))
+        elif tag == 'context':
+            self.context = {'id': attrib.get('id'), 'startdate': '', 'enddate': '', 'dimensions': []}
+        elif tag == 'unit':
+            self.unit = {'id': attrib.get('id'), 'part': 'measures', 'measures': [], 'numerator': [], 'denominator': []}
+        elif tag in ('unitnumerator', 'unitdenominator') and self.unit is not None:
+            self.unit['part'] = tag[4:]
+        elif tag in ('startdate', 'enddate', 'instant', 'explicitmember', 'typedmember', 'measure'):
+            self.field = (tag, attrib, [])
+
+    def data(self, data):
+        for _, pieces in self.open_facts:
+            pieces.append(data)
+        if self.field is not None:
+            self.field[2].append(data)
+
+    def end(self, tag):
+        tag = _local_name(tag)
+        if tag == 'nonfraction' and self.open_facts:
+            self.facts.append(self.open_facts.pop())
+        elif self.field is not None and tag == self.field[0]:
+            name, attrib, pieces = self.field
+            text = ''.join(pieces).strip()
+            self.field = None
+            if self.context is not None:
+                if name == 'instant':
+                    self.context['enddate'] = text
+                elif name in ('startdate', 'enddate'):
+                    self.context[name] = text
+                elif name == 'explicitmember':
+                    self.context['dimensions'].append(f"{attrib.get('dimension', '').split(':')[-1]}={text.split(':')[-1]}")
+                elif name == 'typedmember':
+                    self.context['dimensions'].append(f"{attrib.get('dimension', '').split(':')[-1]}={' '.join(text.split())}")
+            elif self.unit is not None and name == 'measure':
+                self.unit[self.unit['part']].append(text.split(':')[-1])
+        elif tag == 'context' and self.context is not None:
+            context = self.context
+            self.contexts[context['id']] = (context['startdate'], context['enddate'], ';'.join(sorted(context['dimensions'])))
+            self.context = None
+        elif tag in ('unitnumerator', 'unitdenominator') and self.unit is not None:
+            self.unit['part'] = 'measures'
+        elif tag == 'unit' and self.unit is not None:
+            unit = self.unit
+            if unit['numerator']:
+                self.units[unit['id']] = f"{'*'.join(unit['numerator'])}/{'*'.join(unit['denominator'])}"
+            else:
+                self.units[unit['id']] = '*'.join(unit['measures'])
+            self.unit = None
+
+    def comment(self, text):
         pass
 
-    def parse_sec_filing(self, html_content):
+    def close(self):
+        # contexts and units usually sit in ix:header at the top, but nothing guarantees that, so resolve at the end
+        rows = {}
+        for attrib, pieces in self.facts:
+            if attrib.get('nil', '').lower() == 'true' or attrib.get('contextref') not in self.contexts:
+                continue
+            value = _xbrl_number(''.join(pieces), attrib.get('format'))
+            if value is None:
+                continue
+            value *= 10 ** int(attrib.get('scale') or 0)
+            if attrib.get('sign') == '-':
+                value = -value
+            period_start, period_end, dimensions = self.contexts[attrib['contextref']]
+            unit = self.units.get(attrib.get('unitref'), attrib.get('unitref') or '')
+            # the same fact is often tagged again in the notes, keep the first occurrence
+            rows.setdefault((attrib.get('name', ''), attrib['contextref'], unit), (attrib.get('name', ''), period_start, period_end, unit, dimensions, value))
+        return list(rows.values())
+
+class Parser:
+    def __init__(self, engine = SEC_PARSER_ENGINE):
         """
-        Parse SEC filing HTML content and extract relevant sections.
+        SEC filing parser.
         Args:
-            html_content (str): The HTML content of the SEC filing.
-        Returns:
-            dict: A dictionary containing parsed sections of the SEC filing.
-                  Keys are section names, and values are the corresponding content.
+            engine (str): 'lxml' for the C-backed streaming engine, or 'bs4' for BeautifulSoup's html.parser.
+                          The lxml engine falls back to bs4 when lxml is not installed or cannot parse a filing.
         """
+        if engine == 'lxml' and etree is None:
+            engine = 'bs4'
+        self.engine = engine
+
+    def _run_bs4(self, html_content, target):
+        soup = BeautifulSoup(html_content, 'html.parser')
+        stack = [(child, False) for child in reversed(soup.contents)]
+        while stack:
+            node, exiting = stack.pop()
+            if exiting:
+                target.end(node.name)
+            elif isinstance(node, Tag):
+                target.start(node.name, node.attrs)
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(node.contents))
+            elif type(node) in (NavigableString, CData):
+                target.data(str(node))
+            else:
+                target.comment(str(node))
+        return target.close()
+
+    def _feed_lxml(self, data, parser_class, target, **kwargs):
+        parser = parser_class(target=target, huge_tree=True, **kwargs)
+        chunk_size = 1 << 16
+        for start in range(0, len(data), chunk_size):
+            parser.feed(data[start:start + chunk_size])
+        return parser.close()
+
+    def _run_lxml(self, html_content, target_class):
+        data = html_content.encode('utf-8') if isinstance(html_content, str) else html_content
+        try:
+            # inline XBRL filings are XHTML, which the XML parser handles fastest and without reshaping the tree
+            return self._feed_lxml(data, etree.XMLParser, target_class(), resolve_entities=False)
+        except etree.XMLSyntaxError:
+            return self._feed_lxml(data, etree.HTMLParser, target_class())
+
+    def _run(self, html_content, target_class):
+        # drive a fresh parser target over the filing with the configured engine
+        if self.engine == 'lxml':
+            try:
+                return self._run_lxml(html_content, target_class)
+            except Exception as e:
+                logger.warning(f"[Warning] lxml could not parse the filing ({e}), falling back to BeautifulSoup")
+        return self._run_bs4(html_content, target_class())
+
+    def _events(self, html_content):
+        return self._run(html_content, _BlockTarget)
+
+    def _collect_sections(self, html_content):
+        sections = defaultdict(list)
+        current_section = None
+        block = []
+
+        def flush():
+            text = ' '.join(''.join(block).split())
+            block.clear()
+            if current_section is not None and text:
+                sections[current_section].append(text)
+
+        for event in self._events(html_content):
+            if event is FLUSH:
+                flush()
+            elif isinstance(event, tuple):
+                flush()
+                current_section = event[1]
+                sections[current_section] = []
+            else:
+                block.append(event)
+        flush()
+        return sections
+
+    def _collect_sections_nested(self, html_content):
+        # the original extraction: get_text of every span and div, so nested elements repeat their text
         soup = BeautifulSoup(html_content, 'html.parser')
         sections = defaultdict(list)
         current_section = None
 
         for element in soup.find_all(['span', 'div']):
             style = element.get('style', '')
-            if 'font-weight:700' in style or 'font-weight: 700' in style:
+            if _is_bold(style):
                 text = element.get_text(strip=True)
                 if text.lower().startswith("item "):
                     current_section = text
@@ -38,7 +295,69 @@ class Parser:
                 text = element.get_text(strip=True)
                 if text:
                     sections[current_section].append(text)
+        return sections
+
+    def parse_sec_filing(self, html_content):
+        """
+        Parse SEC filing HTML content and extract relevant sections. Each text block is emitted once,
+        in document order.
+        Args:
+            html_content (str): The HTML content of the SEC filing.
+        Returns:
+            dict: A dictionary containing parsed sections of the SEC filing.
+                  Keys are section names, and values are the corresponding content.
+        """
+        return self._clean_sections(self._collect_sections(html_content))
 
+    def parse_xbrl_facts(self, html_content):
+        """
+        Extract the numeric inline XBRL facts of a 10-K/10-Q filing into a compact fact table.
+        Scale and sign attributes are applied, so values are in plain units (e.g. USD, not millions).
+        Args:
+            html_content (str): The HTML content of the SEC filing.
+        Returns:
+            numpy.ndarray: Structured array with fields concept (e.g. 'us-gaap:Revenues'), period_start
+                           ('' for instants), period_end ('YYYY-MM-DD'), unit (e.g. 'USD', 'USD/shares'),
+                           dimensions ('Axis=Member;...', '' for the consolidated entity) and value (float).
+                           Empty if the filing has no inline XBRL.
+        """
+        rows = self._run(html_content, _FactTarget)
+        # string columns are sized to the longest value instead of a fixed worst case
+        concept_width = max([len(row[0]) for row in rows] + [1])
+        unit_width = max([len(row[3]) for row in rows] + [1])
+        dimensions_width = max([len(row[4]) for row in rows] + [1])
+        dtype = np.dtype([
+            ("concept", f"U{concept_width}"),
+            ("period_start", "U10"),
+            ("period_end", "U10"),
+            ("unit", f"U{unit_width}"),
+            ("dimensions", f"U{dimensions_width}"),
+            ("value", np.float64),
+        ])
+        return np.array(rows, dtype=dtype)
+
+    def dedup_report(self, html_content, model = "gpt-4o-mini"):
+        """
+        Compare the output of parse_sec_filing with the original nested-element extraction.
+        Args:
+            html_content (str): The HTML content of the SEC filing.
+            model (str): Model whose tokenizer is used to count tokens.
+        Returns:
+            dict: Per section key, a dict with bytes_before, bytes_after, tokens_before and tokens_after.
+        """
+        before = self._clean_sections(self._collect_sections_nested(html_content))
+        after = self.parse_sec_filing(html_content)
+        report = {}
+        for key in sorted(set(before) | set(after)):
+            report[key] = {
+                "bytes_before": len(before.get(key, "").encode('utf-8')),
+                "bytes_after": len(after.get(key, "").encode('utf-8')),
+                "tokens_before": count_tokens(before.get(key, ""), model),
+                "tokens_after": count_tokens(after.get(key, ""), model),
+            }
+        return report
+
+    def _clean_sections(self, sections):
         # Clean up section names
         cleaned_sections = {}
         for section, content in sections.items():
@@ -67,3 +386,231 @@ class Parser:
             cleaned_sections[section_key] = content
 
         return cleaned_sections
+
+
+class ParsedFilingCache:
+    def __init__(self, cache_dir = os.path.join('cache', 'sections')):
+        """
+        In-process and on-disk cache of parsed SEC filing sections, keyed by filing accession
+        number and invalidated whenever PARSER_VERSION changes.
+        Args:
+            cache_dir (str): Directory where parsed section maps are stored as json.
+        """
+        self.cache_dir = cache_dir
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        self.sections = {}
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.flight = SingleFlight()
+
+    def _path(self, accession):
+        return os.path.join(self.cache_dir, f"{accession}.json")
+
+    def _load(self, accession):
+        path = self._path(accession)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('parser_version') != PARSER_VERSION:
+            return None
+        return data['sections']
+
+    def _store(self, accession, sections):
+        path = self._path(accession)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'parser_version': PARSER_VERSION, 'sections': sections}, f)
+        os.replace(tmp_path, path)
+
+    def peek(self, accession):
+        """
+        Get parsed sections for an accession if they are already cached in process or on disk.
+        Args:
+            accession (str): The filing accession number.
+        Returns:
+            dict: The parsed sections, or None if they are not cached.
+        """
+        with self.lock:
+            sections = self.sections.get(accession)
+        if sections is None:
+            sections = self._load(accession)
+            if sections is not None:
+                with self.lock:
+                    self.sections[accession] = sections
+        return sections
+
+    def _finish(self, accession, future, sections = None, error = None):
+        try:
+            if error is None:
+                self._store(accession, sections)
+                with self.lock:
+                    self.sections[accession] = sections
+        finally:
+            with self.lock:
+                self.pending.pop(accession, None)
+            if error is None:
+                future.set_result(sections)
+            else:
+                future.set_exception(error)
+
+    def _parse_in_thread(self, accession, content, future):
+        try:
+            sections = Parser().parse_sec_filing(content)
+        except Exception as e:
+            self._finish(accession, future, error=e)
+            return
+        self._finish(accession, future, sections)
+
+    def _collect(self, accession, content, future, executor, parse):
+        try:
+            sections = parse.result()
+        except BrokenProcessPool:
+            # a worker died, e.g. while importing an unguarded __main__; the pool is unusable from now on
+            logger.warning(f"[Warning] SEC parse workers failed, parsing filing {accession} in process")
+            _discard_parse_executor(executor)
+            threading.Thread(target=self._parse_in_thread, args=(accession, content, future), daemon=True).start()
+            return
+        except Exception as e:
+            self._finish(accession, future, error=e)
+            return
+        self._finish(accession, future, sections)
+
+    def submit(self, accession, content):
+        """
+        Start parsing a filing on the parse worker processes, unless a cached parse exists.
+        Concurrent submits for the same accession share a single parse. Without parse workers
+        (SEC_PARSE_WORKERS = 0) the filing is parsed right away and a completed future is returned.
+        Args:
+            accession (str): The filing accession number. If None, a hash of the content is used.
+            content (str): The HTML content of the filing.
+        Returns:
+            concurrent.futures.Future: Future of the parsed sections of the filing.
+        """
+        if accession is None:
+            accession = hashlib.sha1(content.encode('utf-8')).hexdigest()
+        executor = get_parse_executor()
+        sections = self.peek(accession)
+        if sections is None and executor is None:
+            sections = self.get(accession, content)
+        if sections is not None:
+            future = Future()
+            future.set_result(sections)
+            return future
+
+        with self.lock:
+            future = self.pending.get(accession)
+            submitted = future is None
+            if submitted:
+                future = Future()
+                self.pending[accession] = future
+        if not submitted:
+            return future
+
+        try:
+            parse = executor.submit(_parse_sec_filing, content)
+        except BrokenProcessPool:
+            parse = Future()
+            parse.set_exception(BrokenProcessPool("SEC parse pool is broken"))
+        # runs right away if the parse already finished, caches before the future leaves pending
+        parse.add_done_callback(lambda parse: self._collect(accession, content, future, executor, parse))
+        return future
+
+    def get(self, accession, content):
+        """
+        Get parsed sections for a filing, parsing it only if no cached parse exists.
+        Concurrent callers for the same accession share a single parse.
+        Args:
+            accession (str): The filing accession number. If None, a hash of the content is used.
+            content (str): The HTML content of the filing.
+        Returns:
+            dict: The parsed sections of the filing.
+        """
+        if accession is None:
+            accession = hashlib.sha1(content.encode('utf-8')).hexdigest()
+        sections = self.peek(accession)
+        if sections is not None:
+            return sections
+        if get_parse_executor() is not None:
+            return self.submit(accession, content).result()
+
+        def parse():
+            sections = self.peek(accession)
+            if sections is None:
+                sections = Parser().parse_sec_filing(content)
+                self._store(accession, sections)
+                with self.lock:
+                    self.sections[accession] = sections
+            return sections
+        return self.flight.do(accession, parse)
+
+def _parse_sec_filing(content):
+    # runs in a parse worker process
+    return Parser().parse_sec_filing(content)
+
+_GUARD = re.compile(r"""^if\s+__name__\s*==\s*['"]__main__['"]\s*:""", re.MULTILINE)
+
+@functools.lru_cache(maxsize=None)
+def _main_reimportable():
+    # spawn runs the main script again in every worker, which is only harmless behind a __main__ guard
+    # (sandboxed coding agent snippets, for one, have none)
+    main = sys.modules.get('__main__')
+    path = getattr(main, '__file__', None)
+    if path is None:
+        # interactive session, nothing to re-import
+        return True
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            guarded = _GUARD.search(f.read()) is not None
+    except OSError:
+        guarded = False
+    if not guarded:
+        logger.warning(f"[Warning] {path} has no __main__ guard, SEC filings are parsed in process")
+    return guarded
+
+_parse_executor = None
+_parse_executor_lock = threading.Lock()
+
+def _discard_parse_executor(executor):
+    global _parse_executor
+    with _parse_executor_lock:
+        if _parse_executor is executor:
+            _parse_executor = None
+    executor.shutdown(wait=False)
+
+def get_parse_executor():
+    """
+    Get the process-wide pool of parse worker processes, creating it on first use.
+    Returns:
+        ProcessPoolExecutor: The shared parse pool, or None if SEC_PARSE_WORKERS is 0 or the
+                             main script could not be safely re-imported by the workers.
+    """
+    global _parse_executor
+    if SEC_PARSE_WORKERS <= 0:
+        return None
+    with _parse_executor_lock:
+        if _parse_executor is None:
+            if not _main_reimportable():
+                return None
+            # spawn, forking a process with live transport and executor threads can deadlock the children
+            _parse_executor = ProcessPoolExecutor(max_workers=SEC_PARSE_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _parse_executor
+
+_parsed_filing_cache = None
+_parsed_filing_cache_lock = threading.Lock()
+
+def get_parsed_filing_cache():
+    """
+    Get the process-wide parsed filing cache, creating it on first use.
+    Returns:
+        ParsedFilingCache: The shared parsed filing cache.
+    """
+    global _parsed_filing_cache
+    with _parsed_filing_cache_lock:
+        if _parsed_filing_cache is None:
+            _parsed_filing_cache = ParsedFilingCache()
+        return _parsed_filing_cache
@@ -0,0 +1,168 @@
+import os
+import time
+import tempfile
+import threading
+import numpy as np
+from datetime import datetime
+from transport import get_transport, SingleFlight
+from config import PRICE_SYNC_MINUTES
+from logger import get_logger
+logger = get_logger(__name__)
+
+# same fields, in the same order, as the rows of the historical-price-full endpoint
+PRICE_DTYPE = np.dtype([
+    ("date", "U10"),
+    ("open", np.float64),
+    ("high", np.float64),
+    ("low", np.float64),
+    ("close", np.float64),
+    ("adjClose", np.float64),
+    ("volume", np.int64),
+    ("unadjustedVolume", np.int64),
+    ("change", np.float64),
+    ("changePercent", np.float64),
+    ("vwap", np.float64),
+    ("label", "U24"),
+    ("changeOverTime", np.float64),
+])
+
+class PriceStore:
+    def __init__(self, root = os.path.join('cache', 'prices'), sync_interval = PRICE_SYNC_MINUTES * 60):
+        """
+        Per-ticker daily price history stored as a NumPy structured array (oldest first) in a .npy
+        file, memory-mapped on read so columns can be used without copies. Syncing only requests the
+        days since the last stored date through the endpoint's from/to parameters.
+        Args:
+            root (str): Directory holding one .npy file per ticker.
+            sync_interval (float): Seconds a synced history is trusted before asking for new days.
+        """
+        self.root = root
+        self.sync_interval = sync_interval
+        if not os.path.exists(self.root):
+            os.makedirs(self.root)
+        self.histories = {}
+        self.lock = threading.Lock()
+        self.flight = SingleFlight()
+
+    def _path(self, ticker):
+        return os.path.join(self.root, f"{ticker}.npy")
+
+    def _fetch(self, ticker, start = None):
+        url = f"https://financialmodelingprep.com/api/v3/historical-price-full/{ticker}?apikey={os.environ.get('FMP_API_KEY')}"
+        if start is not None:
+            url += f"&from={start}&to={datetime.now().strftime('%Y-%m-%d')}"
+        historical_price = get_transport().get(url)
+        historical_price = historical_price.json()
+        rows = historical_price.get("historical", []) if isinstance(historical_price, dict) else []
+        # endpoint returns latest first, the store keeps oldest first so new days are appended
+        rows = rows[::-1]
+        history = np.zeros(len(rows), dtype=PRICE_DTYPE)
+        for name in PRICE_DTYPE.names:
+            kind = PRICE_DTYPE[name].kind
+            default = "" if kind == "U" else 0
+            history[name] = [row.get(name) if row.get(name) is not None else default for row in rows]
+        return history
+
+    def _write(self, ticker, history):
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.npy')
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, history)
+        os.replace(tmp_path, self._path(ticker))
+
+    def _load(self, ticker):
+        path = self._path(ticker)
+        if not os.path.exists(path):
+            return None
+        mtime = os.path.getmtime(path)
+        with self.lock:
+            cached = self.histories.get(ticker)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        history = np.load(path, mmap_mode='r')
+        with self.lock:
+            self.histories[ticker] = (mtime, history)
+        return history
+
+    def _sync(self, ticker):
+        path = self._path(ticker)
+        history = self._load(ticker)
+        if history is not None and time.time() - os.path.getmtime(path) < self.sync_interval:
+            return
+
+        if history is None or len(history) < 2:
+            logger.info(f"[Task] Downloading price history for {ticker}")
+            self._write(ticker, self._fetch(ticker))
+            return
+
+        # refetch the last two stored days too: the last one may have been an intraday bar, and a
+        # changed close on the day before means prices were adjusted (e.g. a split), so start over
+        new_days = self._fetch(ticker, start=history["date"][-2])
+        overlap = new_days[new_days["date"] == history["date"][-2]]
+        if len(overlap) == 0 or not np.isclose(overlap["close"][0], history["close"][-2]):
+            logger.info(f"[Task] Price history for {ticker} was adjusted, downloading it again")
+            self._write(ticker, self._fetch(ticker))
+            return
+
+        new_days = new_days[new_days["date"] > history["date"][-2]]
+        self._write(ticker, np.concatenate([np.asarray(history[:-1]), new_days]))
+
+    def sync(self, ticker):
+        """
+        Bring the stored history of a ticker up to date, unless it was synced recently.
+        Concurrent syncs of the same ticker share one request.
+        Args:
+            ticker (str): The stock ticker symbol.
+        """
+        self.flight.do(ticker, lambda: self._sync(ticker))
+
+    def history(self, ticker):
+        """
+        Get the full price history of a ticker.
+        Args:
+            ticker (str): The stock ticker symbol.
+        Returns:
+            numpy.ndarray: Read-only, memory-mapped structured array with PRICE_DTYPE fields, oldest first.
+        """
+        self.sync(ticker)
+        return self._load(ticker)
+
+    def column(self, ticker, name):
+        """
+        Get a single column of the price history without copying it.
+        Args:
+            ticker (str): The stock ticker symbol.
+            name (str): Column name, e.g. 'close', 'volume' or 'date'.
+        Returns:
+            numpy.ndarray: Read-only view of the column, oldest first.
+        """
+        return self.history(ticker)[name]
+
+    def records(self, ticker, limit = None):
+        """
+        Get the latest days of the price history in the row format of the historical-price-full endpoint.
+        Args:
+            ticker (str): The stock ticker symbol.
+            limit (int): Number of latest days to return, all of them if None.
+        Returns:
+            list: A list of dicts, latest first.
+        """
+        history = self.history(ticker)
+        if limit is not None:
+            history = history[-limit:] if limit > 0 else history[:0]
+        names = PRICE_DTYPE.names
+        return [dict(zip(names, row)) for row in history[::-1].tolist()]
+
+_price_store = None
+_price_store_lock = threading.Lock()
+
+def get_price_store():
+    """
+    Get the process-wide price store, creating it on first use.
+    Returns:
+        PriceStore: The shared price store.
+    """
+    global _price_store
+    with _price_store_lock:
+        if _price_store is None:
+            _price_store = PriceStore()
+        return _price_store
@@ -0,0 +1,60 @@
+import os
+import time
+import threading
+from transport import get_transport, SingleFlight
+from config import CACHE_TTLS
+from logger import get_logger
+logger = get_logger(__name__)
+
+class QuoteSnapshot:
+    def __init__(self, ttl = CACHE_TTLS["quote"]):
+        """
+        Short-lived, process-wide cache of /quote payloads. Concurrent callers asking for the
+        same ticker share a single in-flight request and the same cached payload. Empty payloads
+        are not cached.
+        Args:
+            ttl (float): Number of seconds a quote payload stays fresh.
+        """
+        self.ttl = ttl
+        self.quotes = {}
+        self.lock = threading.Lock()
+        self.flight = SingleFlight()
+
+    def _fetch(self, ticker):
+        url = f"https://financialmodelingprep.com/api/v3/quote/{ticker}?apikey={os.environ.get('FMP_API_KEY')}"
+        quote = get_transport().get(url)
+        quote = quote.json()
+        if len(quote) == 0:
+            # not cached, so the next caller asks again instead of getting nothing for the whole TTL
+            logger.warning(f"[Warning] No quote found for {ticker}")
+            return {}
+        quote = quote[0]
+        with self.lock:
+            self.quotes[ticker] = (time.monotonic(), quote)
+        return quote
+
+    def get(self, ticker):
+        """
+        Get the quote payload for a ticker, fetching it if the cached one is missing or stale.
+        Args:
+            ticker (str): The stock ticker symbol.
+        Returns:
+            dict: A copy of the quote payload with keys like 'price', 'pe', 'marketCap' and 'eps',
+                  empty if the provider has no quote for the ticker.
+        """
+        with self.lock:
+            cached = self.quotes.get(ticker)
+        if cached is not None and time.monotonic() - cached[0] < self.ttl:
+            return dict(cached[1])
+        # a copy per caller, the cached payload is shared by every caller within the TTL
+        return dict(self.flight.do(ticker, lambda: self._fetch(ticker)))
+
+_snapshot = QuoteSnapshot()
+
+def get_quote_snapshot():
+    """
+    Get the process-wide quote snapshot.
+    Returns:
+        QuoteSnapshot: The shared quote snapshot.
+    """
+    return _snapshot
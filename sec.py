@@ -4,49 +4,96 @@ import json
 import shutil
 import shelve
 import random
+import functools
+import threading
 from tqdm import tqdm
 from datetime import datetime, timedelta
 from downloader import Downloader
-from llm import generate_llm_response, self_reflect
+from llm import generate_llm_response, self_reflect, get_llm_executor
 from config import SEC_INSIGHTS
 from agent import Agent
+from transport import SingleFlight
+from packer import pack_document
 from logger import get_logger
 logger = get_logger(__name__)
 
+SEC_SECTIONS = [
+    "get_financial_statements_10q",
+    "get_managements_discussion_and_analysis_10q",
+    "get_quantitative_and_qualitative_disclosures_10q",
+    "get_controls_and_procedures_10q",
+    "get_legal_proceedings_10q",
+    "get_risk_factors_10q",
+    "get_unregistered_sales_of_equity_10q",
+    "get_business_info_10k",
+    "get_risk_factors_10k",
+    "get_legal_proceedings_10k",
+    "get_managements_discussion_and_analysis_10k",
+    "get_quantitative_and_qualitative_disclosures_10k",
+    "get_financial_statements_and_supplementary_10k",
+    "get_directors_executive_officers_and_10k",
+    "get_controls_and_procedures_10k",
+    "get_executive_compensation_10k",
+    "get_security_ownership_of_certain_10k",
+    "get_exhibit_and_financial_statement_10k",
+]
+
+class LazySections:
+    def __init__(self, loaders):
+        """
+        Mapping of section name to section content that only loads a section the first time it is
+        used and remembers it afterwards. Concurrent first uses of a section share one load.
+        Args:
+            loaders (dict): Mapping of section name to a zero-argument callable returning its content.
+        """
+        self.loaders = loaders
+        self.values = {}
+        self.lock = threading.Lock()
+        self.flight = SingleFlight()
+
+    def keys(self):
+        return self.loaders.keys()
+
+    def __len__(self):
+        return len(self.loaders)
+
+    def __contains__(self, name):
+        return name in self.loaders
+
+    def __getitem__(self, name):
+        with self.lock:
+            if name in self.values:
+                return self.values[name]
+
+        def load():
+            value = self.loaders[name]()
+            with self.lock:
+                self.values[name] = value
+            return value
+        return self.flight.do(name, load)
+
 class SECAgent(Agent):
     def __init__(self, ticker):
         self.ticker = ticker
-        self.functions_to_call = {
-            "get_financial_statements_10q": Downloader().get_financial_statements_10q(self.ticker),
-            "get_managements_discussion_and_analysis_10q": Downloader().get_managements_discussion_and_analysis_10q(self.ticker),
-            "get_quantitative_and_qualitative_disclosures_10q": Downloader().get_quantitative_and_qualitative_disclosures_10q(self.ticker),
-            "get_controls_and_procedures_10q": Downloader().get_controls_and_procedures_10q(self.ticker),
-            "get_legal_proceedings_10q": Downloader().get_legal_proceedings_10q(self.ticker),
-            "get_risk_factors_10q": Downloader().get_risk_factors_10q(self.ticker),
-            "get_unregistered_sales_of_equity_10q": Downloader().get_unregistered_sales_of_equity_10q(self.ticker),
-            "get_business_info_10k": Downloader().get_business_info_10k(self.ticker),
-            "get_risk_factors_10k": Downloader().get_risk_factors_10k(self.ticker),
-            "get_legal_proceedings_10k": Downloader().get_legal_proceedings_10k(self.ticker),
-            "get_managements_discussion_and_analysis_10k": Downloader().get_managements_discussion_and_analysis_10k(self.ticker),
-            "get_quantitative_and_qualitative_disclosures_10k": Downloader().get_quantitative_and_qualitative_disclosures_10k(self.ticker),
-            "get_financial_statements_and_supplementary_10k": Downloader().get_financial_statements_and_supplementary_10k(self.ticker),
-            "get_directors_executive_officers_and_10k": Downloader().get_directors_executive_officers_and_10k(self.ticker),
-            "get_controls_and_procedures_10k": Downloader().get_controls_and_procedures_10k(self.ticker),
-            "get_executive_compensation_10k": Downloader().get_executive_compensation_10k(self.ticker),
-            "get_security_ownership_of_certain_10k": Downloader().get_security_ownership_of_certain_10k(self.ticker),
-            "get_exhibit_and_financial_statement_10k": Downloader().get_exhibit_and_financial_statement_10k(self.ticker),
-        }
+        downloader = Downloader(self.ticker)
+        # sections are only fetched and parsed when extract() picks them
+        self.functions_to_call = LazySections({
+            name: functools.partial(getattr(downloader, name), self.ticker) for name in SEC_SECTIONS
+        })
 
-    def extract(self):
+    def extract_request(self):
         """
-        Extract insights from a randomly selected SEC filing section.
+        Build the LLM request of extract, for running it through a BatchExecutor.
         Returns:
-            str: A paragraph of insights with a heading/title in the first line,
-                 based on the selected SEC filing section.
+            dict: Keyword arguments for generate_llm_response.
         """
 
-        agent_data = random.choice(list(self.functions_to_call.keys()))
-        agent_data = self.functions_to_call[agent_data]
+        section = random.choice(list(self.functions_to_call.keys()))
+        packed = pack_document(str(self.functions_to_call[section]), model="gpt-4o-mini", label=section[len("get_"):],
+                               query=f"{self.ticker} revenue income margin growth risk")
+        if packed.dropped:
+            logger.info(f"[Context] {self.ticker} SEC: {packed.report()}")
+        agent_data = packed.text
         prompt = f"""
         You are an expert financial analyst at reading SEC filings and drawing conclusions that only a PhD level quant can draw.
         You are given an unstructured part of an SEC 10K/10Q and your job is to carefully read it, and extract some kind of a unique insight.
@@ -62,7 +109,16 @@ class SECAgent(Agent):
         No prefix, suffix, starting with `here is`, etc. Start directly with insights. Use numbers and statistics where you can.
         """
 
-        result = generate_llm_response(prompt, model="gpt-4o-mini")
+        return {"prompt": prompt, "model": "gpt-4o-mini"}
+
+    def extract(self):
+        """
+        Extract insights from a randomly selected SEC filing section.
+        Returns:
+            str: A paragraph of insights with a heading/title in the first line,
+                 based on the selected SEC filing section.
+        """
+        result = generate_llm_response(**self.extract_request())
         return result
 
     def run(self):
@@ -75,9 +131,7 @@ class SECAgent(Agent):
         
         logger.info(f"[Task] Gathering insights from SEC filings for {self.ticker}")
         logger.info(f"[Task] Running SEC agent to extract {SEC_INSIGHTS} insights")
-        insights = []
-        for _ in tqdm(range(SEC_INSIGHTS), desc="Extracting SEC insights", unit="insight"):
-            data = self.extract()
-            insights.append(data)
+        futures = [get_llm_executor().submit(self.extract) for _ in range(SEC_INSIGHTS)]
+        insights = [future.result() for future in tqdm(futures, desc="Extracting SEC insights", unit="insight")]
         logger.info(f"[Task] Success, extracted {len(insights)} insights from SEC filings for {self.ticker}")
         return insights
\ No newline at end of file
@@ -0,0 +1,126 @@
+import uuid
+import pytest
+import llm
+from llm import BatchExecutor, LocalBatchBackend
+from usage import get_usage_tracker, usage_context
+from config import LLM_BATCH_DISCOUNT
+
+USAGE = {"prompt_tokens": 1000, "completion_tokens": 100, "prompt_tokens_details": {"cached_tokens": 0}}
+
+def respond(body):
+    n = body.get("n", 1)
+    return {"choices": [{"message": {"content": f" {body['messages'][1]['content']} {i} "}} for i in range(n)], "usage": USAGE}
+
+class PolledBackend(LocalBatchBackend):
+    # answers like the provider: in progress for a few polls, then in a final status
+    def __init__(self, final_status = "completed", polls = 2, status_errors = 0):
+        super().__init__(respond)
+        self.discounted = True
+        self.final_status = final_status
+        self.polls = polls
+        self.status_errors = status_errors
+        self.created = []
+        self.status_calls = 0
+
+    def create(self, path, completion_window):
+        with open(path) as f:
+            self.created.append(sum(1 for _ in f))
+        return super().create(path, completion_window)
+
+    def status(self, batch_id):
+        self.status_calls += 1
+        if self.status_errors:
+            self.status_errors -= 1
+            raise ConnectionError("connection reset")
+        return "in_progress" if self.status_calls <= self.polls else self.final_status
+
+@pytest.fixture
+def live(monkeypatch):
+    calls = []
+    def generate(prompt, model, temperature, seed, n, system, site = None):
+        calls.append(prompt)
+        return [f"live {prompt}"] * n
+    monkeypatch.setattr(llm, "_generate", generate)
+    return calls
+
+@pytest.fixture
+def run_id():
+    run_id = uuid.uuid4().hex
+    with usage_context(ticker="TEST", run_id=run_id):
+        yield run_id
+
+def executor(backend, tmp_path, **kwargs):
+    return BatchExecutor(backend, poll_interval=0, batch_dir=str(tmp_path), **kwargs)
+
+def test_submit_poll_collect(tmp_path, live, run_id):
+    backend = PolledBackend(polls=2)
+    batch = executor(backend, tmp_path)
+    first = batch.submit("a", site="Test.first")
+    second = batch.submit("b", n=3, site="Test.second")
+    assert not first.done()
+    batch.flush()
+    assert first.result() == ["a 0"]
+    assert second.result() == ["b 0", "b 1", "b 2"]
+    assert backend.status_calls == 3
+    assert backend.created == [2]
+    assert live == []
+    assert list(tmp_path.iterdir()) == []
+
+@pytest.mark.parametrize("final_status", ["failed", "expired"])
+def test_unanswered_batch_falls_back_to_live_requests(tmp_path, live, run_id, final_status):
+    backend = PolledBackend(final_status=final_status)
+    backend.results = lambda batch_id: []
+    batch = executor(backend, tmp_path)
+    future = batch.submit("a", site="Test.first")
+    batch.flush()
+    assert future.result() == ["live a"]
+    assert live == ["a"]
+
+def test_failed_requests_of_a_batch_fall_back_to_live_requests(tmp_path, live, run_id):
+    def respond_or_fail(body):
+        if body["messages"][1]["content"] == "bad":
+            raise ValueError("rejected")
+        return respond(body)
+    batch = executor(LocalBatchBackend(respond_or_fail), tmp_path)
+    good, bad = batch.submit("good"), batch.submit("bad")
+    batch.flush()
+    assert good.result() == ["good 0"]
+    assert bad.result() == ["live bad"]
+    assert live == ["bad"]
+
+def test_transient_status_errors_are_retried(tmp_path, live, run_id):
+    backend = PolledBackend(polls=0, status_errors=2)
+    batch = executor(backend, tmp_path)
+    future = batch.submit("a")
+    batch.flush()
+    assert future.result() == ["a 0"]
+    assert live == []
+
+def test_large_queues_are_split_into_several_batches(tmp_path, live, run_id):
+    backend = PolledBackend(polls=0)
+    batch = executor(backend, tmp_path, max_requests=2)
+    futures = [batch.submit(f"p{i}") for i in range(5)]
+    batch.flush()
+    assert backend.created == [2, 2, 1]
+    assert [future.result() for future in futures] == [[f"p{i} 0"] for i in range(5)]
+
+    backend = PolledBackend(polls=0)
+    batch = executor(backend, tmp_path, max_bytes=1)
+    futures = [batch.submit(f"p{i}") for i in range(3)]
+    batch.flush()
+    assert backend.created == [1, 1, 1]
+
+def test_usage_is_recorded_with_the_backend_discount(tmp_path, live, run_id):
+    discounted = executor(PolledBackend(polls=0), tmp_path)
+    discounted.submit("a", model="gpt-4o", site="Test.discounted")
+    discounted.flush()
+    local = executor(LocalBatchBackend(respond), tmp_path)
+    local.submit("a", model="gpt-4o", site="Test.local")
+    local.flush()
+
+    entries = {entry["site"]: entry for entry in get_usage_tracker().entries(run_id)}
+    assert entries["Test.discounted"]["ticker"] == "TEST"
+    assert entries["Test.discounted"]["batch"] is True
+    assert entries["Test.local"]["batch"] is False
+    assert entries["Test.discounted"]["prompt_tokens"] == 1000
+    assert entries["Test.discounted"]["cost"] == pytest.approx(entries["Test.local"]["cost"] * LLM_BATCH_DISCOUNT)
@@ -0,0 +1,37 @@
+import os
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FILING = "<html><body><p><b>Item 1. Business</b></p><p>We make widgets.</p><p><b>Item 1A. Risk Factors</b></p><p>Widgets may fail.</p></body></html>"
+
+# no __main__ guard, like the snippets sandbox.run_code executes
+UNGUARDED_SCRIPT = """
+import parser
+parser.SEC_PARSE_WORKERS = 2
+{setup}
+sections = parser.get_parsed_filing_cache().submit(None, {filing!r}).result(timeout=120)
+assert sections == parser.Parser().parse_sec_filing({filing!r}), sections
+sections = parser.get_parsed_filing_cache().submit("other", {filing!r}).result(timeout=120)
+assert sections == parser.Parser().parse_sec_filing({filing!r}), sections
+assert parser._parse_executor is None
+print("ok")
+"""
+
+def run_unguarded(tmp_path, setup = ""):
+    script = tmp_path / "snippet.py"
+    script.write_text(UNGUARDED_SCRIPT.format(setup=setup, filing=FILING))
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    return subprocess.run([sys.executable, str(script)], cwd=tmp_path, env=env, capture_output=True, text=True, timeout=300)
+
+def test_submit_from_unguarded_script_parses_in_process(tmp_path):
+    result = run_unguarded(tmp_path)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "ok"
+
+def test_broken_parse_pool_falls_back_to_in_process_parsing(tmp_path):
+    # pretend the script is safe to re-import, the workers then die importing it
+    result = run_unguarded(tmp_path, setup="parser._main_reimportable = lambda: True")
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "ok"
@@ -0,0 +1,33 @@
+import functools
+from logger import get_logger
+logger = get_logger(__name__)
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+    logger.warning("[Warning] tiktoken is not installed, token counts are estimated at 4 characters per token")
+
+CHARS_PER_TOKEN = 4 # rough ratio for english prose, used when tiktoken is not installed
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+def count_tokens(text, model = "gpt-4o-mini"):
+    """
+    Count the tokens a text costs for a model.
+    Args:
+        text (str): The text.
+        model (str): The OpenAI model name.
+    Returns:
+        int: Exact token count if tiktoken is installed, an estimate otherwise.
+    """
+    if not text:
+        return 0
+    if tiktoken is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(_encoding(model).encode(text, disallowed_special=()))
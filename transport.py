@@ -0,0 +1,208 @@
+import time
+import random
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from config import HTTP_POOL_SIZE, HTTP_MAX_CONNECTIONS_PER_HOST, HTTP_MAX_RETRIES, HTTP_BACKOFF_BASE, HTTP_BACKOFF_CAP, HTTP_TIMEOUT, HOST_RATE_LIMITS, HTTP_PAGE_WINDOW
+from logger import get_logger
+logger = get_logger(__name__)
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    def __init__(self, rate, capacity = None):
+        """
+        Thread-safe token bucket rate limiter.
+        Args:
+            rate (float): Tokens added to the bucket per second.
+            capacity (float): Maximum number of tokens the bucket can hold. Defaults to one second worth of tokens.
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens = 1):
+        """
+        Block until the requested number of tokens is available, then take them.
+        Args:
+            tokens (float): Number of tokens to take. Requests larger than the capacity are clamped to it.
+        """
+        tokens = min(float(tokens), self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+class Transport:
+    def __init__(self, pool_size = HTTP_POOL_SIZE, max_connections_per_host = HTTP_MAX_CONNECTIONS_PER_HOST, rate_limits = HOST_RATE_LIMITS,
+                 max_retries = HTTP_MAX_RETRIES, timeout = HTTP_TIMEOUT):
+        """
+        Shared HTTP transport with a keep-alive connection pool, per-host concurrency caps,
+        per-host token bucket rate limits and retries with jittered exponential backoff.
+        Args:
+            pool_size (int): Number of keep-alive connections kept per host.
+            max_connections_per_host (int): Maximum number of requests in flight to a single host.
+            rate_limits (dict): Mapping of host to allowed requests per second.
+            max_retries (int): Number of retries on 429/5xx responses and connection errors.
+            timeout (float): Timeout in seconds for a single request.
+        """
+        self.max_connections_per_host = max_connections_per_host
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.buckets = {host: TokenBucket(rate) for host, rate in rate_limits.items()}
+        self.semaphores = {}
+        self.lock = threading.Lock()
+
+    def _semaphore(self, host):
+        with self.lock:
+            if host not in self.semaphores:
+                self.semaphores[host] = threading.BoundedSemaphore(self.max_connections_per_host)
+            return self.semaphores[host]
+
+    def _backoff(self, attempt, response = None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after is not None:
+            try:
+                # the server's hint is trusted, but a bad header must not stall the worker
+                return min(max(float(retry_after), 0), HTTP_BACKOFF_CAP)
+            except ValueError:
+                pass
+        # full jitter: spread retries from many callers instead of synchronising them
+        return random.uniform(0, min(HTTP_BACKOFF_CAP, HTTP_BACKOFF_BASE * (2 ** attempt)))
+
+    def get(self, url, params = None, headers = None):
+        """
+        Issue a GET request through the shared connection pool.
+        Args:
+            url (str): The URL to fetch.
+            params (dict): Optional query parameters.
+            headers (dict): Optional request headers.
+        Returns:
+            requests.Response: The final response, after retries on 429/5xx.
+        """
+        host = urlparse(url).hostname
+        bucket = self.buckets.get(host)
+        for attempt in range(self.max_retries + 1):
+            if bucket is not None:
+                bucket.acquire()
+            try:
+                with self._semaphore(host):
+                    response = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"[Warning] Request to {host} failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                return response
+            delay = self._backoff(attempt, response)
+            logger.warning(f"[Warning] {host} returned {response.status_code}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+def iter_pages(fetch_page, page_size, max_pages, window = HTTP_PAGE_WINDOW, stop = None):
+    """
+    Fetch numbered pages concurrently within a bounded window and yield them in page order.
+    Stops at the first short or empty page; pages requested past it are discarded.
+    Args:
+        fetch_page (callable): Function taking a page number and returning the list of items on it.
+        page_size (int): Number of items on a full page.
+        max_pages (int): Maximum number of pages to fetch.
+        window (int): Maximum number of pages in flight at once.
+        stop (callable): Optional predicate on a page's items; fetching stops after the first page it is True for.
+    Yields:
+        list: The items of each page, in page order.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, window)) as executor:
+        futures = {page: executor.submit(fetch_page, page) for page in range(min(window, max_pages))}
+        next_page = len(futures)
+        page = 0
+        try:
+            while page in futures:
+                items = futures.pop(page).result()
+                yield items
+                if len(items) < page_size or (stop is not None and stop(items)):
+                    break
+                if next_page < max_pages:
+                    futures[next_page] = executor.submit(fetch_page, next_page)
+                    next_page += 1
+                page += 1
+        finally:
+            for future in futures.values():
+                future.cancel()
+
+_transport = None
+_transport_lock = threading.Lock()
+
+def get_transport():
+    """
+    Get the process-wide shared transport, creating it on first use.
+    Returns:
+        Transport: The shared transport instance.
+    """
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = Transport()
+        return _transport
+
+class SingleFlight:
+    def __init__(self):
+        """
+        Coalesce concurrent calls for the same key so that only one of them does the work
+        and every caller waiting on that key shares its result (or its exception).
+        """
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, fn):
+        """
+        Run fn for the given key unless a call for the key is already in flight, in which case wait for it.
+        Args:
+            key (hashable): The key identifying the work.
+            fn (callable): Zero-argument callable doing the work.
+        Returns:
+            Any: The result of fn.
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"event": threading.Event(), "result": None, "error": None}
+                self.calls[key] = call
+
+        if not leader:
+            call["event"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call["event"].set()
@@ -0,0 +1,186 @@
+import os
+import sys
+import json
+import time
+import threading
+import contextlib
+import contextvars
+from collections import defaultdict
+from config import LLM_PRICES, LLM_BATCH_DISCOUNT
+from logger import get_logger
+logger = get_logger(__name__)
+
+_ticker = contextvars.ContextVar("usage_ticker", default=None)
+_run_id = contextvars.ContextVar("usage_run_id", default=None)
+
+# frames in these files are plumbing, the calling site is the first frame outside of them
+_PLUMBING_FILES = {os.path.abspath(os.path.join(os.path.dirname(__file__), name)) for name in ('llm.py', 'usage.py')}
+
+@contextlib.contextmanager
+def usage_context(ticker = None, run_id = None):
+    """
+    Tag every LLM call made inside the block, including calls submitted to the LLM executor from it,
+    with a ticker and run id.
+    Args:
+        ticker (str): The stock ticker symbol.
+        run_id (str): Identifier of the run.
+    """
+    ticker_token = _ticker.set(ticker)
+    run_id_token = _run_id.set(run_id)
+    try:
+        yield
+    finally:
+        _run_id.reset(run_id_token)
+        _ticker.reset(ticker_token)
+
+def calling_site():
+    """
+    Find the function that asked for an LLM call, e.g. 'Analyst.price_target' or 'NewsAgent.extract'.
+    Returns:
+        str: The qualified name of the first caller outside llm.py, or 'unknown'.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        if os.path.abspath(frame.f_code.co_filename) not in _PLUMBING_FILES:
+            owner = frame.f_locals.get('self')
+            name = frame.f_code.co_name
+            return f"{type(owner).__name__}.{name}" if owner is not None else name
+        frame = frame.f_back
+    return "unknown"
+
+def estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens, batch = False):
+    """
+    Estimate the cost of a request from the per million token prices in LLM_PRICES.
+    Args:
+        model (str): The OpenAI model name.
+        prompt_tokens (int): Prompt tokens, including cached ones.
+        completion_tokens (int): Completion tokens.
+        cached_tokens (int): Prompt tokens served from OpenAI's prompt cache.
+        batch (bool): True if the request went through the batch API, which bills LLM_BATCH_DISCOUNT of the price.
+    Returns:
+        float: The cost in USD, 0 for models without a price.
+    """
+    prices = LLM_PRICES.get(model)
+    if prices is None:
+        return 0.0
+    cost = ((prompt_tokens - cached_tokens) * prices["input"] + cached_tokens * prices["cached_input"]
+            + completion_tokens * prices["output"]) / 1e6
+    return cost * LLM_BATCH_DISCOUNT if batch else cost
+
+class UsageTracker:
+    def __init__(self):
+        """
+        Process-wide record of every LLM request: tokens, latency, model and calling site,
+        tagged with the ticker and run id of the usage_context it was made in.
+        """
+        self.records = []
+        self.lock = threading.Lock()
+
+    def record(self, model, site, prompt_tokens = 0, completion_tokens = 0, cached_tokens = 0, latency = 0.0, responses = 1, cache_hit = False, batch = False):
+        """
+        Record one LLM request, or one answer served from the LLM response cache.
+        Args:
+            model (str): The OpenAI model name.
+            site (str): The calling site, see calling_site.
+            prompt_tokens (int): Prompt tokens, including cached ones.
+            completion_tokens (int): Completion tokens.
+            cached_tokens (int): Prompt tokens served from OpenAI's prompt cache.
+            latency (float): Seconds the request took.
+            responses (int): Number of completions in the response.
+            cache_hit (bool): True if the answer came from the LLM response cache and cost nothing.
+            batch (bool): True if the request was billed through the batch API, at LLM_BATCH_DISCOUNT of the price.
+        """
+        entry = {
+            "run_id": _run_id.get(),
+            "ticker": _ticker.get(),
+            "site": site,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cached_tokens": cached_tokens,
+            "latency": latency,
+            "responses": responses,
+            "cache_hit": cache_hit,
+            "batch": batch,
+            "cost": estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens, batch),
+            "timestamp": time.time(),
+        }
+        with self.lock:
+            self.records.append(entry)
+
+    def entries(self, run_id = None):
+        """
+        Get the recorded requests.
+        Args:
+            run_id (str): Only requests of this run, all of them if None.
+        Returns:
+            list: The recorded requests as dicts.
+        """
+        with self.lock:
+            return [dict(entry) for entry in self.records if run_id is None or entry["run_id"] == run_id]
+
+    def cached_ratio(self, run_id = None, site_prefix = None):
+        """
+        Get the share of prompt tokens that the provider served from its prompt cache.
+        Args:
+            run_id (str): Only requests of this run, all of them if None.
+            site_prefix (str): Only requests whose calling site starts with this, e.g. 'Analyst.'.
+        Returns:
+            float: Cached prompt tokens over prompt tokens, 0 if there were none.
+        """
+        entries = [entry for entry in self.entries(run_id) if site_prefix is None or entry["site"].startswith(site_prefix)]
+        prompt_tokens = sum(entry["prompt_tokens"] for entry in entries)
+        return sum(entry["cached_tokens"] for entry in entries) / prompt_tokens if prompt_tokens else 0.0
+
+    def summary(self, run_id = None):
+        """
+        Aggregate the recorded requests per calling site.
+        Args:
+            run_id (str): Only requests of this run, all of them if None.
+        Returns:
+            dict: Mapping of site to its calls, cache_hits, prompt_tokens, completion_tokens, cached_tokens,
+                  latency (summed seconds) and cost (USD), most expensive site first.
+        """
+        stages = defaultdict(lambda: {"calls": 0, "cache_hits": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "latency": 0.0, "cost": 0.0})
+        for entry in self.entries(run_id):
+            stage = stages[entry["site"]]
+            stage["calls"] += 1
+            stage["cache_hits"] += int(entry["cache_hit"])
+            for key in ("prompt_tokens", "completion_tokens", "cached_tokens", "latency", "cost"):
+                stage[key] += entry[key]
+        return dict(sorted(stages.items(), key=lambda item: item[1]["cost"], reverse=True))
+
+    def log_summary(self, run_id = None):
+        """
+        Log the per site summary as a table.
+        Args:
+            run_id (str): Only requests of this run, all of them if None.
+        """
+        summary = self.summary(run_id)
+        lines = [f"{'stage':<32}{'calls':>7}{'hits':>6}{'prompt':>10}{'cached':>10}{'cached%':>8}{'output':>9}{'seconds':>9}{'usd':>9}"]
+        for site, stage in list(summary.items()) + [("total", {key: sum(stage[key] for stage in summary.values()) for key in
+                                                              ("calls", "cache_hits", "prompt_tokens", "cached_tokens", "completion_tokens", "latency", "cost")})]:
+            cached_percent = 100 * stage['cached_tokens'] / stage['prompt_tokens'] if stage['prompt_tokens'] else 0
+            lines.append(f"{site[:31]:<32}{stage['calls']:>7}{stage['cache_hits']:>6}{stage['prompt_tokens']:>10}{stage['cached_tokens']:>10}{cached_percent:>7.0f}%"
+                         f"{stage['completion_tokens']:>9}{stage['latency']:>9.1f}{stage['cost']:>9.3f}")
+        logger.info("[Usage] LLM usage per stage\n" + "\n".join(lines))
+
+    def write(self, path, run_id = None):
+        """
+        Write the summary and the individual requests as json.
+        Args:
+            path (str): Path of the json file.
+            run_id (str): Only requests of this run, all of them if None.
+        """
+        with open(path, "w") as f:
+            json.dump({"run_id": run_id, "summary": self.summary(run_id), "calls": self.entries(run_id)}, f, indent=2)
+
+_usage_tracker = UsageTracker()
+
+def get_usage_tracker():
+    """
+    Get the process-wide LLM usage tracker.
+    Returns:
+        UsageTracker: The shared usage tracker.
+    """
+    return _usage_tracker
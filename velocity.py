@@ -2,26 +2,46 @@ import os
 import pytz
 import json
 import shutil
-import shelve
+import uuid
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
-from downloader import Downloader
+from downloader import Downloader, AsyncDownloader
 from parser import Parser
 from sec_edgar_downloader import Downloader as SECDownloader
 from datetime import datetime, timedelta
-from llm import generate_llm_response, self_reflect
+from llm import generate_llm_response, self_reflect, get_llm_executor, BatchExecutor, OpenAIBatchBackend, LocalBatchBackend
+from sandbox import run_code
+from config import SEC_INSIGHTS, FINANCIAL_STATISTICAL_INSIGHTS, NEWS_INSIGHTS, EARNINGS_TRANSCRIPT_INSIGHTS
 from coder import CodingAgent
 from news import NewsAgent
 from sec import SECAgent
 from earnings import EarningsAgent
 from analyst import Analyst
 from htmler import HTMLer
+from caching import get_cache, SQLiteStore, migrate_shelve
+from usage import get_usage_tracker, usage_context
 import argparse
 from logger import get_logger
 logger = get_logger(__name__)
 
+# prefetched data sources each agent reads, it starts as soon as these are in; the SEC agent waits for
+# none, its sections are downloaded and parsed when an extraction first reads them
+AGENT_SOURCES = {
+    SECAgent: (),
+    CodingAgent: ("quote", "company_information", "price_chart_historical", "analyst_price_targets", "insider_trades",
+                  "institutional_ownership", "stock_peers", "historical_earnings", "gdp_growth_rate"),
+    NewsAgent: ("ticker_news",),
+    EarningsAgent: ("earnings_transcript",),
+}
+
 def parse_arguments():
     parser = argparse.ArgumentParser(description='Velocity analysis for a given stock ticker')
     parser.add_argument('--ticker', type=str, help='Stock ticker symbol')
+    parser.add_argument('--tickers', type=str, help='Comma separated stock ticker symbols, e.g. AAPL,MSFT,NVDA')
+    parser.add_argument('--batch', nargs='?', const='openai', choices=['openai', 'local'],
+                        help='Send the LLM requests of all tickers through the batch API, stage by stage. Cheaper, but takes up to the batch completion window per stage. '
+                             '`local` answers the batches right away with regular requests')
     parser.add_argument('--openai_key', type=str, help='OpenAI API key')
     parser.add_argument('--fmp_key', type=str, help='Financial Modeling Prep API key')
     return parser.parse_args()
@@ -33,7 +53,7 @@ def set_api_keys(args):
         os.environ['FMP_API_KEY'] = args.fmp_key
 
 def validate_inputs(args):
-    if not args.ticker:
+    if not args.ticker and not args.tickers:
         raise ValueError("Ticker symbol is required.")
     
     if 'OPENAI_API_KEY' not in os.environ and not args.openai_key:
@@ -48,7 +68,8 @@ def validate_inputs(args):
 class Velocity:
     def __init__(self, ticker):
         self.ticker = ticker
-        self.cache_file = 'cache/insights.db'
+        self.cache = SQLiteStore('cache/insights.sqlite3')
+        migrate_shelve('cache/insights.db', self.cache)
         self.cache_expiry = timedelta(minutes=300)  # Cache expires after 30 minutes
         self.historical_price = Downloader().get_price_chart_historical(self.ticker)
         self.analyst = Analyst(self.ticker)
@@ -61,55 +82,103 @@ class Velocity:
         """
         logger.info(f"[Plan] Gathering insights for {self.ticker} from all the data I have, including SEC filings, news, earnings, price, institutions, etc, I need some time for this, lets go...")
         # check in cache and load
-        with shelve.open(self.cache_file) as cache:
-            if self.ticker in cache and cache[self.ticker]['timestamp'] > datetime.now() - self.cache_expiry:
-                logger.info(f"[Cache] Data already cached for {self.ticker}, using it.")
-                return cache[self.ticker]['insights']
-
-        insights = []
-        insights.append(SECAgent(self.ticker).run())
-        insights.append(CodingAgent(self.ticker).run())
-        insights.append(NewsAgent(self.ticker).run())
-        insights.append(EarningsAgent(self.ticker).run())
-
-        # save to cache with timestamp
-        logger.info(f"[Cache] Saving insights for {self.ticker} to cache so that we dont have to re-do them again")
-        with shelve.open(self.cache_file) as cache:
-            cache[self.ticker] = {
-                'insights': insights,
-                'timestamp': datetime.now()
-            }
+        cached_insights = self.cached_insights()
+        if cached_insights is not None:
+            return cached_insights
+
+        # fetch every data source concurrently, each agent reads from warm caches once its own sources are in
+        sources = AsyncDownloader().start_prefetch(self.ticker)
 
+        def run_agent(agent_class):
+            wait([sources[name] for name in AGENT_SOURCES[agent_class]])
+            return agent_class(self.ticker).run()
+
+        # the agents run side by side, so their work overlaps the slower downloads
+        with ThreadPoolExecutor(max_workers=len(AGENT_SOURCES), thread_name_prefix="agent") as pool:
+            futures = [pool.submit(contextvars.copy_context().run, run_agent, agent_class) for agent_class in AGENT_SOURCES]
+            insights = [future.result() for future in futures]
+        self.save_insights(insights)
         return insights
 
-    def run(self):
+    def cached_insights(self):
         """
-        Execute the main Velocity analysis workflow.
-        This method gathers insights, performs analysis, and saves the results.
+        Get the insights of an earlier run if they have not expired yet.
+        Returns:
+            list: A list of insights from different agents, or None.
+        """
+        cached_insights = self.cache.get(self.ticker)
+        if cached_insights is not None and cached_insights['timestamp'] > datetime.now() - self.cache_expiry:
+            logger.info(f"[Cache] Data already cached for {self.ticker}, using it.")
+            return cached_insights['insights']
+        return None
+
+    def save_insights(self, insights):
+        """
+        Cache the insights with a timestamp.
+        Args:
+            insights (list): A list of insights from different agents.
+        """
+        logger.info(f"[Cache] Saving insights for {self.ticker} to cache so that we dont have to re-do them again")
+        self.cache.set(self.ticker, {
+            'insights': insights,
+            'timestamp': datetime.now()
+        })
+
+    @staticmethod
+    def insights_to_string(insights):
+        """
+        Join the insights of all agents for the analyst prompts.
+        Args:
+            insights (list): A list of insights from different agents.
+        Returns:
+            str: The insights, separated by blank lines.
         """
-        insights = self.gather_insights()
         insights_string = ""
         for category in insights:
             for insight in category:
                 insights_string += f"{insight}\n\n"
+        return insights_string
+
+    def run(self):
+        """
+        Execute the main Velocity analysis workflow.
+        This method gathers insights, performs analysis, and saves the results.
+        """
+        run_id = f"{self.ticker}-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        try:
+            with usage_context(ticker=self.ticker, run_id=run_id):
+                self._run(run_id)
+        finally:
+            # also after a failed run, the spend up to the failure is just as interesting
+            logger.info(f"[Task] Saving LLM usage to output/{self.ticker}.usage.json")
+            usage = get_usage_tracker()
+            usage.log_summary(run_id)
+            os.makedirs("output", exist_ok=True)
+            usage.write(os.path.join("output", f"{self.ticker}.usage.json"), run_id)
+
+    def _run(self, run_id):
+        insights = self.gather_insights()
+        insights_string = self.insights_to_string(insights)
 
         logger.info(f"[Plan] Insights retrieved, we are now going to do some analysis")
-        radar = self.analyst.radar(insights_string)
-        
-        targets = self.analyst.price_target(insights_string)
-        bull_case = self.analyst.bull_case(insights_string)
-        bear_case = self.analyst.bear_case(insights_string)
+        # the analyst sections are independent, except the base case which weighs the bull and bear cases.
+        # The provider caches the shared system prefix per model, so one section per model goes first,
+        # radar on gpt-4o and the bull case on gpt-4o-mini, and the rest fan out once both are answered
+        executor = get_llm_executor()
+        radar = executor.submit(self.analyst.radar, insights_string)
+        bull_case = executor.submit(self.analyst.bull_case, insights_string)
+        radar, bull_case = radar.result(), bull_case.result()
+        targets = executor.submit(self.analyst.price_target, insights_string)
+        bear_case = executor.submit(self.analyst.bear_case, insights_string)
+        risk_reward_themes = executor.submit(self.analyst.risk_reward_themes, insights_string)
+        thesis = executor.submit(self.analyst.thesis, insights_string)
+        heading = executor.submit(self.analyst.heading, insights_string)
+
+        bear_case = bear_case.result()
         base_case, heading_case = self.analyst.base_case(insights_string, bull_case, bear_case)
-        risk_reward_themes = self.analyst.risk_reward_themes(insights_string)
-        thesis = self.analyst.thesis(insights_string)
-        heading = self.analyst.heading(insights_string)
-        
-        current_price = self.analyst.current_stock_price
-        
-        # save this output in a json in output/ticker.json
-        logger.info(f"[Task] Saving the output to a json file in output/{self.ticker}.json")
-        data = {
-            "ticker": self.ticker,
+        targets, risk_reward_themes, thesis, heading = targets.result(), risk_reward_themes.result(), thesis.result(), heading.result()
+        logger.info(f"[Usage] {get_usage_tracker().cached_ratio(run_id, site_prefix='Analyst.'):.0%} of the analyst prompt tokens were served from the provider's prompt cache")
+        self.save({
             "price_target": targets,
             "bull_case": bull_case,
             "bear_case": bear_case,
@@ -118,8 +187,32 @@ class Velocity:
             "thesis": thesis,
             "heading": heading,
             "heading_case": heading_case,
-            "current_price": current_price,
             "radar": radar,
+        })
+
+    def save(self, sections):
+        """
+        Save the report as output/ticker.json and as html.
+        Args:
+            sections (dict): The analyst sections, i.e price_target, bull_case, bear_case, base_case,
+                             risk_reward_themes, thesis, heading, heading_case and radar.
+        """
+        current_price = self.analyst.current_stock_price
+        
+        # save this output in a json in output/ticker.json
+        logger.info(f"[Task] Saving the output to a json file in output/{self.ticker}.json")
+        data = {
+            "ticker": self.ticker,
+            "price_target": sections["price_target"],
+            "bull_case": sections["bull_case"],
+            "bear_case": sections["bear_case"],
+            "base_case": sections["base_case"],
+            "risk_reward_themes": sections["risk_reward_themes"],
+            "thesis": sections["thesis"],
+            "heading": sections["heading"],
+            "heading_case": sections["heading_case"],
+            "current_price": current_price,
+            "radar": sections["radar"],
             "chart": self.historical_price
         }
 
@@ -135,12 +228,166 @@ class Velocity:
 
         # save as html
         HTMLer(self.ticker).to_html()
+        logger.info(f"[Cache] Downloader cache hits and misses: {get_cache().stats()}")
+
+class VelocityBatch:
+    def __init__(self, tickers, backend = None):
+        """
+        Run Velocity for many tickers with the LLM requests going through the batch API, e.g. for
+        an overnight universe run. The workflow runs stage by stage over all tickers, each stage
+        is one batch: agent insights, coding insights, analyst sections, base case, shorter base case.
+        A ticker that fails is logged and left out of the later stages.
+        Args:
+            tickers (list): Stock ticker symbols.
+            backend: Batch backend of the BatchExecutor, OpenAIBatchBackend if None.
+        """
+        self.tickers = tickers
+        self.batch = BatchExecutor(backend)
+        self.run_id = f"batch-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        self.velocities = {}
+
+    def submit(self, owner, name, *args):
+        """
+        Queue the LLM request of an agent or analyst method for the next batch.
+        Args:
+            owner: The agent or analyst.
+            name (str): The method, e.g. 'extract' for the request built by extract_request.
+            *args: Arguments for the request builder.
+        Returns:
+            concurrent.futures.Future: Future of the list of responses.
+        """
+        # usage is recorded under the method the request stands in for, e.g. 'Analyst.bull_case'
+        return self.batch.submit(site=f"{type(owner).__name__}.{name}", **getattr(owner, f"{name}_request")(*args))
+
+    def each(self, step, state):
+        """
+        Run a step for every ticker still in the run, dropping the tickers it fails for.
+        Args:
+            step (callable): Called with the ticker, its Velocity and its state dict.
+            state (dict): Mapping of ticker to the state dict its steps share.
+        """
+        for ticker in list(self.velocities):
+            try:
+                with usage_context(ticker=ticker, run_id=self.run_id):
+                    step(ticker, self.velocities[ticker], state[ticker])
+            except Exception as e:
+                logger.error(f"[Error] Batch run failed for {ticker}, skipping it: {e}")
+                del self.velocities[ticker]
+
+    def run(self):
+        """
+        Execute the Velocity workflow for all tickers and save a report per ticker.
+        """
+        try:
+            with usage_context(run_id=self.run_id):
+                self._run()
+        finally:
+            logger.info(f"[Task] Saving LLM usage to output/{self.run_id}.usage.json")
+            usage = get_usage_tracker()
+            usage.log_summary(self.run_id)
+            os.makedirs("output", exist_ok=True)
+            usage.write(os.path.join("output", f"{self.run_id}.usage.json"), self.run_id)
+
+    def _run(self):
+        state = {ticker: {} for ticker in self.tickers}
+        for ticker in self.tickers:
+            try:
+                with usage_context(ticker=ticker, run_id=self.run_id):
+                    self.velocities[ticker] = Velocity(ticker)
+            except Exception as e:
+                logger.error(f"[Error] Batch run failed for {ticker}, skipping it: {e}")
+
+        def prefetch(ticker, velocity, state):
+            state["insights"] = velocity.cached_insights()
+            if state["insights"] is None:
+                # every ticker downloads in the background while the requests of the ones before it are built
+                state["sources"] = AsyncDownloader().start_prefetch(ticker)
+
+        def agent_requests(ticker, velocity, state):
+            if state["insights"] is not None:
+                return
+            agents = {}
+            for agent_class in AGENT_SOURCES:
+                wait([state["sources"][name] for name in AGENT_SOURCES[agent_class]])
+                agents[agent_class] = agent_class(ticker)
+            state["coder"] = agents[CodingAgent]
+            state["sec"] = [self.submit(agents[SECAgent], "extract") for _ in range(SEC_INSIGHTS)]
+            state["code"] = [self.submit(state["coder"], "code") for _ in range(FINANCIAL_STATISTICAL_INSIGHTS)]
+            state["news"] = [self.submit(agents[NewsAgent], "extract") for _ in range(NEWS_INSIGHTS)]
+            state["earnings"] = [self.submit(agents[EarningsAgent], "extract") for _ in range(EARNINGS_TRANSCRIPT_INSIGHTS)]
+
+        def coding_requests(ticker, velocity, state):
+            if state["insights"] is not None:
+                return
+            coder = state["coder"]
+            state["coding"] = []
+            for code_plan in state["code"]:
+                code_plan = coder.parse_code(code_plan.result()[0])
+                analysis = run_code(code_plan)
+                if analysis is None or analysis == "":
+                    continue
+                state["coding"].append(self.submit(coder, "insights", code_plan, analysis))
+
+        def analyst_requests(ticker, velocity, state):
+            if state["insights"] is None:
+                # same order as Velocity.gather_insights
+                state["insights"] = [[future.result()[0] for future in state[source]] for source in ("sec", "coding", "news", "earnings")]
+                velocity.save_insights(state["insights"])
+            state["insights_string"] = velocity.insights_to_string(state["insights"])
+            # all in one batch: a batch can take hours, far longer than the provider keeps a prompt cached,
+            # so a warm-up batch like the one of Velocity._run would only add a round-trip
+            for section in ("radar", "price_target", "bull_case", "bear_case", "risk_reward_themes", "thesis", "heading"):
+                state[section] = self.submit(velocity.analyst, section, state["insights_string"])
+
+        def base_case_request(ticker, velocity, state):
+            state["bull_case"] = json.loads(state["bull_case"].result()[0])
+            state["bear_case"] = json.loads(state["bear_case"].result()[0])
+            state["base_case"] = self.submit(velocity.analyst, "base_case", state["insights_string"], state["bull_case"], state["bear_case"])
+
+        def shorter_base_case_request(ticker, velocity, state):
+            state["base_case"] = state["base_case"].result()[0]
+            state["heading_case"] = self.submit(velocity.analyst, "shorter_base_case", state["base_case"])
+
+        def save(ticker, velocity, state):
+            analyst = velocity.analyst
+            velocity.save({
+                "price_target": analyst.parse_price_targets(state["price_target"].result()),
+                "bull_case": state["bull_case"],
+                "bear_case": state["bear_case"],
+                "base_case": json.loads(state["base_case"]),
+                "risk_reward_themes": json.loads(state["risk_reward_themes"].result()[0]),
+                "thesis": json.loads(state["thesis"].result()[0]),
+                "heading": state["heading"].result()[0],
+                "heading_case": state["heading_case"].result()[0],
+                "radar": analyst.parse_radar(state["radar"].result()),
+            })
+
+        self.each(prefetch, state)
+        stages = [
+            ("agent insights", agent_requests),
+            ("coding insights", coding_requests),
+            ("analyst sections", analyst_requests),
+            ("base cases", base_case_request),
+            ("shorter base cases", shorter_base_case_request),
+        ]
+        for name, step in stages:
+            logger.info(f"[Plan] Batch stage: {name} for {len(self.velocities)} tickers")
+            self.each(step, state)
+            self.batch.flush()
+        self.each(save, state)
+        logger.info(f"[Task] Success, saved reports for {len(self.velocities)} of {len(self.tickers)} tickers")
 
 def main():
     args = parse_arguments()
     set_api_keys(args)
     validate_inputs(args)
-    Velocity(args.ticker).run()
+    tickers = [ticker.strip() for ticker in args.tickers.split(',') if ticker.strip()] if args.tickers else [args.ticker]
+    if args.batch:
+        backend = LocalBatchBackend() if args.batch == 'local' else OpenAIBatchBackend()
+        VelocityBatch(tickers, backend).run()
+        return
+    for ticker in tickers:
+        Velocity(ticker).run()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
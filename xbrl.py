@@ -0,0 +1,182 @@
+import os
+import hashlib
+import threading
+import numpy as np
+from collections import defaultdict
+from parser import Parser, XBRL_PARSER_VERSION
+from transport import SingleFlight
+from logger import get_logger
+logger = get_logger(__name__)
+
+class FactTable:
+    def __init__(self, facts):
+        """
+        Queryable view over the inline XBRL facts of one filing, indexed by concept so lookups
+        only touch the rows of that concept.
+        Args:
+            facts (numpy.ndarray): Structured array as returned by Parser.parse_xbrl_facts.
+        """
+        self.facts = facts
+        index = defaultdict(list)
+        for row, concept in enumerate(facts["concept"].tolist()):
+            index[concept].append(row)
+            # also reachable without the taxonomy prefix, 'Revenues' for 'us-gaap:Revenues'
+            local_name = concept.split(":")[-1]
+            if local_name != concept:
+                index[local_name].append(row)
+        self.index = {concept: np.array(rows) for concept, rows in index.items()}
+
+    def __len__(self):
+        return len(self.facts)
+
+    def concepts(self):
+        """
+        Get the concepts reported in the filing.
+        Returns:
+            list: Sorted concept names, e.g. ['us-gaap:Assets', 'us-gaap:Revenues', ...].
+        """
+        return sorted(set(self.facts["concept"].tolist()))
+
+    def lookup(self, concept, dimensions = False):
+        """
+        Get the facts of a concept.
+        Args:
+            concept (str): Concept name, with or without taxonomy prefix.
+            dimensions (bool): Include facts about a segment/member, not only the consolidated entity.
+        Returns:
+            numpy.ndarray: Matching rows, latest period end first.
+        """
+        rows = self.index.get(concept)
+        if rows is None:
+            return self.facts[:0]
+        facts = self.facts[rows]
+        if not dimensions:
+            facts = facts[facts["dimensions"] == ""]
+        return facts[np.argsort(facts["period_end"], kind="stable")[::-1]]
+
+    def records(self, concept, dimensions = False):
+        """
+        Get the facts of a concept as a list of dicts.
+        Args:
+            concept (str): Concept name, with or without taxonomy prefix.
+            dimensions (bool): Include facts about a segment/member, not only the consolidated entity.
+        Returns:
+            list: Dicts with keys `concept`, `period_start`, `period_end`, `unit`, `dimensions`, `value`, latest first.
+        """
+        names = self.facts.dtype.names
+        return [dict(zip(names, row)) for row in self.lookup(concept, dimensions).tolist()]
+
+    def value(self, concept, period_end = None):
+        """
+        Get a single consolidated value of a concept. For durations ending on the same day, the
+        shortest one wins, i.e. the quarter in a 10-Q and the fiscal year in a 10-K.
+        Args:
+            concept (str): Concept name, with or without taxonomy prefix.
+            period_end (str): Period end date 'YYYY-MM-DD', the latest one if None.
+        Returns:
+            float: The value, or None if the filing does not report it.
+        """
+        facts = self.lookup(concept)
+        if len(facts) == 0:
+            return None
+        period_end = period_end or facts["period_end"][0]
+        facts = facts[facts["period_end"] == period_end]
+        if len(facts) == 0:
+            return None
+        # ISO dates sort like strings, so the latest start is the shortest period; instants have no start
+        return float(facts["value"][np.argmax(facts["period_start"])])
+
+class XBRLFactCache:
+    def __init__(self, cache_dir = os.path.join('cache', 'xbrl')):
+        """
+        In-process and on-disk cache of inline XBRL fact tables, keyed by filing accession number
+        and invalidated whenever XBRL_PARSER_VERSION changes.
+        Args:
+            cache_dir (str): Directory where fact tables are stored as .npy files.
+        """
+        self.cache_dir = cache_dir
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        self.tables = {}
+        self.lock = threading.Lock()
+        self.flight = SingleFlight()
+
+    def _path(self, accession):
+        return os.path.join(self.cache_dir, f"{accession}.v{XBRL_PARSER_VERSION}.npy")
+
+    def _load(self, accession):
+        path = self._path(accession)
+        if not os.path.exists(path):
+            return None
+        try:
+            return FactTable(np.load(path))
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, accession, facts):
+        path = self._path(accession)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, facts)
+        os.replace(tmp_path, path)
+
+    def peek(self, accession):
+        """
+        Get the fact table of an accession if it is already cached in process or on disk.
+        Args:
+            accession (str): The filing accession number.
+        Returns:
+            FactTable: The fact table, or None if it is not cached.
+        """
+        with self.lock:
+            table = self.tables.get(accession)
+        if table is None:
+            table = self._load(accession)
+            if table is not None:
+                with self.lock:
+                    self.tables[accession] = table
+        return table
+
+    def get(self, accession, content):
+        """
+        Get the fact table of a filing, extracting it only if no cached table exists.
+        Concurrent callers for the same accession share a single parse.
+        Args:
+            accession (str): The filing accession number. If None, a hash of the content is used.
+            content (str): The HTML content of the filing.
+        Returns:
+            FactTable: The fact table of the filing.
+        """
+        if accession is None:
+            accession = hashlib.sha1(content.encode('utf-8')).hexdigest()
+        table = self.peek(accession)
+        if table is not None:
+            return table
+
+        def parse():
+            table = self.peek(accession)
+            if table is None:
+                facts = Parser().parse_xbrl_facts(content)
+                if len(facts) == 0:
+                    logger.warning(f"[Warning] No inline XBRL facts found in filing {accession}")
+                self._store(accession, facts)
+                table = FactTable(facts)
+                with self.lock:
+                    self.tables[accession] = table
+            return table
+        return self.flight.do(accession, parse)
+
+_xbrl_fact_cache = None
+_xbrl_fact_cache_lock = threading.Lock()
+
+def get_xbrl_fact_cache():
+    """
+    Get the process-wide XBRL fact cache, creating it on first use.
+    Returns:
+        XBRLFactCache: The shared XBRL fact cache.
+    """
+    global _xbrl_fact_cache
+    with _xbrl_fact_cache_lock:
+        if _xbrl_fact_cache is None:
+            _xbrl_fact_cache = XBRLFactCache()
+        return _xbrl_fact_cache